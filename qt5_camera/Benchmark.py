@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+from Camera import Camera
+from FrameBuffer import FrameRingBuffer, frames_for_megabytes, POLICIES, BLOCK
+from VideoWriter import Writer
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160), "8k": (7680, 4320)}
+CODECS = ("avi", "mp4", "raw")
+
+
+def current_rss():
+    # resident memory in bytes, linux only
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, interval=0.05):
+        threading.Thread.__init__(self, daemon=True)
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_case(resolution, codec, duration, fps, entropy, buffer_mb, policy, encoder, directory):
+    # one recording from a synthetic camera, returns a result row
+    w, h = RESOLUTIONS[resolution]
+    cam = Camera(f"synthetic:entropy={entropy}", fps, 100, 100, shape=(w, h))
+    buffer = FrameRingBuffer(frames_for_megabytes(buffer_mb, (h, w)), (h, w), policy=policy)
+    cam.add_sink(buffer)
+    savepath = os.path.join(directory, f"{resolution}.{codec}")
+    writer = Writer(buffer=buffer, savepath=savepath, framerate=fps or 30, shape=(w, h),
+                    encoder=encoder, write_index=False)
+
+    #generate the synthetic frames and allocate the capture buffers before timing
+    cam.grab()
+    cam.retrieve()
+
+    baseline = current_rss()
+    sampler = MemorySampler()
+    sampler.start()
+    start = time.monotonic()
+    writer.start()
+    cam.start()
+    time.sleep(duration)
+    cam.stop()
+    captured_time = time.monotonic() - start
+    buffer.close()
+    writer.wait()
+    total_time = time.monotonic() - start
+    sampler.stop()
+
+    #every captured frame is either written or dropped by the buffer
+    captured = cam.stats.count
+    written = writer.stats.count
+    return {
+        "resolution": resolution,
+        "width": w,
+        "height": h,
+        "codec": codec,
+        "encoder": encoder,
+        "requested_fps": fps,
+        "entropy": entropy,
+        "captured": captured,
+        "written": written,
+        "dropped": buffer.dropped,
+        "drop_rate": buffer.dropped / captured if captured else 0.0,
+        "capture_fps": captured / captured_time,
+        "write_fps": written / total_time,
+        "capture_ms": 1000 * cam.stats.busy / captured if captured else 0.0,
+        "encode_ms": 1000 * writer.stats.busy / written if written else 0.0,
+        "max_writer_lag_ms": 1000 * writer.stats.max_lag,
+        "drain_s": total_time - captured_time,
+        "peak_rss_mb": sampler.peak / 1e6,
+        "peak_rss_increase_mb": (sampler.peak - baseline) / 1e6,
+    }
+
+
+def environment():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3,
+    }
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="qt5_camera benchmark",
+                                     description="Capture/encode throughput with a synthetic camera.")
+    parser.add_argument("--resolutions", default="720p,1080p,4k,8k",
+                        help=f"comma separated, from {', '.join(RESOLUTIONS)}")
+    parser.add_argument("--codecs", default=",".join(CODECS), help=f"comma separated, from {', '.join(CODECS)}")
+    parser.add_argument("--encoder", choices=("serial", "parallel"), default="serial")
+    parser.add_argument("--duration", type=float, default=5, help="seconds of capture per case")
+    parser.add_argument("--fps", type=float, default=0, help="synthetic camera rate, 0 for unthrottled")
+    parser.add_argument("--entropy", type=float, default=0.1, help="fraction of noise pixels in the frames")
+    parser.add_argument("--buffer-mb", type=float, default=1024)
+    parser.add_argument("--policy", choices=POLICIES, default=BLOCK)
+    parser.add_argument("--out", default="benchmark.json", help="json report")
+    parser.add_argument("--keep", action="store_true", help="keep the recorded files")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    directory = tempfile.mkdtemp(prefix="qt5_camera_bench_")
+    results = []
+    try:
+        for resolution in args.resolutions.split(","):
+            for codec in args.codecs.split(","):
+                row = run_case(resolution, codec, args.duration, args.fps, args.entropy,
+                               args.buffer_mb, args.policy, args.encoder, directory)
+                print(f"{resolution:>6} {codec:>4}: capture {row['capture_fps']:8.1f} fps, "
+                      f"write {row['write_fps']:8.1f} fps, dropped {row['dropped']}, "
+                      f"peak rss {row['peak_rss_mb']:.0f} MB")
+                results.append(row)
+    finally:
+        if args.keep:
+            print(f"recordings kept in {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+    with open(args.out, "w") as f:
+        json.dump({"environment": environment(), "settings": vars(args), "results": results}, f, indent=2)
+    print(f"report written to {args.out}")
+    return 0
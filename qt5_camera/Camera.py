@@ -2,32 +2,338 @@ import cv2
 import numpy as np
 from PyQt5 import QtCore
 import threading
+import time
+from collections import namedtuple
+from Metrics import StageStats
+from Synthetic import open_capture
 
 class Signals(QtCore.QObject):
     signal_frame_changed = QtCore.pyqtSignal(np.ndarray)
     signal_framerate_changed = QtCore.pyqtSignal(float)
+    signal_connection_changed = QtCore.pyqtSignal(bool)
+    signal_property_changed = QtCore.pyqtSignal(str, float)
+
+# capture modes: "bgr" decodes to BGR and converts, "gray" asks the backend for monochrome frames and
+# "yuyv" takes the raw Y plane of a YUYV stream (V4L2), both of which skip the colour conversion
+CAPTURE_MODES = ("bgr", "gray", "yuyv")
+
+# passed to sinks along with every frame. index counts grabbed frames, timestamp is time.monotonic()
+# at grab time (shared by all cameras of a CameraGroup) and pos_msec is the backend's own
+# CAP_PROP_POS_MSEC for the frame, a driver/hardware timestamp where the backend provides one
+FrameInfo = namedtuple("FrameInfo", ["index", "timestamp", "pos_msec"])
+
+# driver properties read back after set_property, reported through signal_property_changed
+READBACK_PROPERTIES = {"gamma": cv2.CAP_PROP_GAMMA, "brightness": cv2.CAP_PROP_BRIGHTNESS}
+
+# properties that change the size of the frames, sinks are sized from frame_size when they are made
+# so these can only be set while the camera is not capturing
+SHAPE_PROPERTIES = ("shape", "roi", "binning", "capture_mode")
 
 class Camera(threading.Thread):
-    def __init__(self, camera_index, framerate, gamma, brightness, shape: object = (7680, 4320)):
+    def __init__(self, camera_index, framerate, gamma, brightness, shape: object = (7680, 4320),
+                 capture_mode="bgr", pool_size=3, roi=None, binning=1, reconnect=True):
         threading.Thread.__init__(self)
         self.signals = Signals()
         self.running = False
+        self._stop_event = threading.Event()
+        #set by a CameraGroup driving this camera from its own thread
+        self.group = None
+        #reopen the device with exponential backoff after max_failures failed grabs in a row
+        self.reconnect = reconnect
+        self.max_failures = 30
+        self.reconnect_delay = 0.1
+        self.max_reconnect_delay = 5.0
+        #property changes requested through set_property, applied between frames
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        #framerates the driver did not report even after reopening, not retried
+        self._refused_framerates = set()
         self.camera_index = camera_index
-        self.cap = cv2.VideoCapture(self.camera_index)
+        self.cap = open_capture(self.camera_index)
         self.gamma = gamma
         self.framerate = framerate
         self.actual_framerate = self.cap.get(cv2.CAP_PROP_FPS)
         self.brightness = brightness
         self.shape = shape
+        self.capture_mode = capture_mode
+        self.sinks = []
+        self.frame_index = -1
+        self.grab_time = None
+        self.pos_msec = None
+        #retrieve/convert timing for Metrics, and the measured framerate emitted once per second
+        self.stats = StageStats()
+        self.measured_framerate = 0.0
+        self._fps_count = 0
+        self._fps_time = time.monotonic()
+
+        #reused frame buffers, allocated from the first retrieved frame. frames handed to sinks
+        #rotate through the pool so a consumer holding on to the previous frame is not overwritten
+        self.pool_size = pool_size
+        self._pool_index = 0
+        self._raw_pool = None
+        self._gray_pool = None
+        self._binned_pool = None
+        self._yuyv_shape = None
+        self.binning = binning
+        self.roi = roi
+
+    def add_sink(self, sink):
+        # sinks receive every frame through sink.put(frame, info) on the capture thread, the list is
+        # replaced rather than mutated so run() can iterate it without locking
+        self.sinks = self.sinks + [sink]
+
+    def remove_sink(self, sink):
+        self.sinks = [s for s in self.sinks if s is not sink]
+
     def run(self):
         self.running = True
+        failures = 0
         while self.running:
-            ret, frame = self.cap.read()
-            if ret:
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                self.signals.signal_frame_changed.emit(frame)
+            if self._pending:
+                self._apply_pending()
+            if self.grab():
+                failures = 0
+                start = time.perf_counter()
+                frame = self.retrieve()
+                if frame is not None:
+                    self.stats.add(time.perf_counter() - start)
+                    self.deliver(frame, FrameInfo(self.frame_index, self.grab_time, self.pos_msec))
+            else:
+                failures += 1
+                if self.reconnect and failures >= self.max_failures:
+                    self._reconnect()
+                    failures = 0
         self.cap.release()
 
+    def stop(self, timeout=None):
+        # stop capturing and wait for the capture thread, or just close the device if it never ran
+        self.running = False
+        self._stop_event.set()
+        if self.is_alive():
+            if threading.current_thread() is not self:
+                self.join(timeout)
+        else:
+            self.cap.release()
+
+    def _reopen(self):
+        self.cap.release()
+        self.cap = open_capture(self.camera_index)
+        if not self.cap.isOpened():
+            return False
+        #apply the settings to the new handle
+        self.gamma = self.gamma
+        self.framerate = self.framerate
+        self.brightness = self.brightness
+        self.shape = self.shape
+        self.capture_mode = self.capture_mode
+        self.roi = self.roi
+        return True
+
+    def _reconnect(self):
+        print(f"camera {self.camera_index} stopped delivering frames, reconnecting")
+        self.signals.signal_connection_changed.emit(False)
+        self.cap.release()
+        delay = self.reconnect_delay
+        while self.running:
+            if self._stop_event.wait(delay):
+                return
+            if self._reopen():
+                print(f"camera {self.camera_index} reconnected")
+                self.signals.signal_connection_changed.emit(True)
+                return
+            delay = min(2 * delay, self.max_reconnect_delay)
+
+    def set_property(self, name, value):
+        # change a camera property (gamma, brightness, framerate, ...) from any thread.
+        # while capturing, requests are queued and applied by the capture thread between frames,
+        # only the latest value per property is applied so dragging a slider costs one cap.set per frame
+        if self.capturing:
+            if name in SHAPE_PROPERTIES:
+                raise ValueError(f"{name} changes the frame size, stop the camera before setting it")
+            with self._pending_lock:
+                self._pending[name] = value
+        else:
+            self._apply_property(name, value)
+
+    @property
+    def capturing(self):
+        # whether a thread is grabbing from this camera, its own or a CameraGroup's
+        return self.is_alive() or (self.group is not None and self.group.is_alive())
+
+    def _apply_pending(self):
+        #never wait for the GUI, if it is adding a request right now pick it up next frame
+        if not self._pending_lock.acquire(blocking=False):
+            return
+        pending, self._pending = self._pending, {}
+        self._pending_lock.release()
+        for name, value in pending.items():
+            self._apply_property(name, value, reopen=True)
+
+    def _apply_property(self, name, value, reopen=False):
+        setattr(self, name, value)
+        if name == "framerate":
+            #some drivers only change the rate when the device is reopened. that is tried once per
+            #rate and only on the capture thread, a rate that still is not reported is not retried
+            if reopen and abs(self.actual_framerate - value) > 0.5 and value not in self._refused_framerates:
+                self._reopen()
+                if abs(self.actual_framerate - value) > 0.5:
+                    self._refused_framerates.add(value)
+            self.signals.signal_property_changed.emit(name, self.actual_framerate)
+        elif name in READBACK_PROPERTIES:
+            self.signals.signal_property_changed.emit(name, self.cap.get(READBACK_PROPERTIES[name]))
+
+    def deliver(self, frame, info):
+        for sink in self.sinks:
+            sink.put(frame, info)
+        self.signals.signal_frame_changed.emit(frame)
+
+        self._fps_count += 1
+        elapsed = info.timestamp - self._fps_time
+        if elapsed >= 1.0:
+            self.measured_framerate = self._fps_count / elapsed
+            self.signals.signal_framerate_changed.emit(self.measured_framerate)
+            self._fps_count = 0
+            self._fps_time = info.timestamp
+
+    @property
+    def frame_size(self):
+        # (width, height) of the frames handed to sinks, after region of interest and binning
+        if self._gray_pool is not None:
+            pool = self._binned_pool if self.binning > 1 else self._gray_pool
+            return pool.shape[2], pool.shape[1]
+        w, h = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        x, y, w, h = self._crop_box(h, w)
+        return w // self.binning, h // self.binning
+
+    def grab(self):
+        ret = self.cap.grab()
+        if ret:
+            self.grab_time = time.monotonic()
+            self.frame_index += 1
+        return ret
+
+    def retrieve(self):
+        # decode the last grabbed frame into the buffer pool and return it as a 2d grayscale array.
+        #pos_msec is read here rather than in grab so a CameraGroup grabs without driver calls in between
+        self.pos_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        self._pool_index = (self._pool_index + 1) % self.pool_size
+        raw = self._raw_pool[self._pool_index] if self._raw_pool is not None else None
+        ret, frame = self.cap.retrieve(raw)
+        if not ret:
+            return None
+        if frame is not raw:
+            #first frame, or the stream format, region of interest or binning changed
+            self._allocate_pools(frame)
+        #crop before converting so only the region of interest is processed
+        gray = self._to_gray(self._crop(self._unpack(frame)), self._gray_pool[self._pool_index])
+        if self.binning > 1:
+            #area interpolation by an integer factor averages each binning x binning block
+            binned = self._binned_pool[self._pool_index]
+            cv2.resize(gray, (binned.shape[1], binned.shape[0]), dst=binned, interpolation=cv2.INTER_AREA)
+            return binned
+        return gray
+
+    def _clear_pools(self):
+        #reallocated from the next retrieved frame, until then frame_size is worked out from the settings
+        self._raw_pool = None
+        self._gray_pool = None
+        self._binned_pool = None
+
+    def _allocate_pools(self, frame):
+        self._raw_pool = np.empty((self.pool_size,) + frame.shape, dtype=frame.dtype)
+        if frame.ndim == 2 and frame.shape[0] == 1:
+            self._yuyv_shape = (int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                                int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 2)
+        h, w = self._crop(self._unpack(frame)).shape[:2]
+        self._gray_pool = np.empty((self.pool_size, h, w), dtype=np.uint8)
+        b = self.binning
+        self._binned_pool = np.empty((self.pool_size, h // b, w // b), dtype=np.uint8) if b > 1 else None
+
+    def _unpack(self, frame):
+        if frame.ndim == 2 and frame.shape[0] == 1:
+            #unconverted yuyv comes back as one flat row
+            return frame.reshape(self._yuyv_shape)
+        return frame
+
+    def _crop_box(self, h, w):
+        # software region of interest clipped to the frame and trimmed to a multiple of the binning
+        if self.roi is None or self.hardware_roi:
+            x, y, rw, rh = 0, 0, w, h
+        else:
+            x, y, rw, rh = self.roi
+            x, y = min(max(x, 0), w), min(max(y, 0), h)
+            rw, rh = min(rw, w - x), min(rh, h - y)
+        return x, y, rw - rw % self.binning, rh - rh % self.binning
+
+    def _crop(self, frame):
+        x, y, w, h = self._crop_box(*frame.shape[:2])
+        if (w, h) == frame.shape[1::-1]:
+            return frame
+        return frame[y:y + h, x:x + w]
+
+    def _to_gray(self, frame, gray):
+        if frame.ndim == 2:
+            return frame
+        channels = frame.shape[2]
+        if channels == 1:
+            return frame[:, :, 0]
+        if channels == 2:
+            #yuyv, the luma plane is every other byte
+            np.copyto(gray, frame[:, :, 0])
+        elif channels == 3:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=gray)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGRA2GRAY, dst=gray)
+        return gray
+
+    @property
+    def roi(self):
+        return self._roi
+
+    @roi.setter
+    def roi(self, roi):
+        # (x, y, width, height) in sensor pixels, or None for the full frame. the driver crops
+        # where the backend supports it (XIMEA), otherwise frames are cropped after retrieve
+        self._roi = tuple(int(v) for v in roi) if roi is not None else None
+        self.hardware_roi = False
+        if self._roi is not None and self.cap.isOpened() and self.cap.getBackendName() == "XIMEA":
+            x, y, w, h = self._roi
+            self.hardware_roi = all([self.cap.set(cv2.CAP_PROP_XI_WIDTH, w),
+                                     self.cap.set(cv2.CAP_PROP_XI_HEIGHT, h),
+                                     self.cap.set(cv2.CAP_PROP_XI_OFFSET_X, x),
+                                     self.cap.set(cv2.CAP_PROP_XI_OFFSET_Y, y)])
+        self._clear_pools()
+
+    @property
+    def binning(self):
+        return self._binning
+
+    @binning.setter
+    def binning(self, binning):
+        # average binning x binning pixel blocks into one, e.g. 2 or 4
+        if int(binning) < 1:
+            raise ValueError("binning must be at least 1")
+        self._binning = int(binning)
+        self._clear_pools()
+
+    @property
+    def capture_mode(self):
+        return self._capture_mode
+
+    @capture_mode.setter
+    def capture_mode(self, capture_mode):
+        if capture_mode not in CAPTURE_MODES:
+            raise ValueError(f"capture mode {capture_mode} not supported, use one of {CAPTURE_MODES}")
+        self._capture_mode = capture_mode
+        self._clear_pools()
+        if capture_mode == "gray":
+            self.cap.set(cv2.CAP_PROP_MONOCHROME, 1)
+        elif capture_mode == "yuyv":
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"YUYV"))
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        else:
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 1)
+
     @property
     def gamma(self):
         return self._gamma
@@ -58,6 +364,7 @@ class Camera(threading.Thread):
     @shape.setter
     def shape(self, shape):
         self._shape = shape
+        self._clear_pools()
         w, h = shape
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, w)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, h)
\ No newline at end of file
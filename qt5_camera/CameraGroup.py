@@ -0,0 +1,122 @@
+import numpy as np
+import threading
+import time
+import os
+from Camera import FrameInfo
+from FrameBuffer import FrameRingBuffer, frames_for_megabytes, BLOCK
+from VideoWriter import Writer
+
+class CameraGroup(threading.Thread):
+    # Drives several Camera objects from one thread instead of starting their own. Every iteration
+    # grabs all cameras back to back (grab only latches the frame, so this is fast) and only then
+    # retrieves and decodes them, which keeps the skew between cameras down to the grab loop.
+    # All frames of one iteration share the same monotonic timestamp. Property changes through
+    # Camera.set_property are applied between iterations. A camera failing max_failures grabs in a
+    # row is reopened, while all cameras fail the loop backs off up to max_idle_delay seconds.
+    def __init__(self, cameras):
+        threading.Thread.__init__(self)
+        self.cameras = list(cameras)
+        for cam in self.cameras:
+            cam.group = self
+        self.running = False
+        self.max_idle_delay = 0.5
+        self._stop_event = threading.Event()
+        self.writers = []
+        self.buffers = []
+        n = len(self.cameras)
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.failed = np.zeros(n, dtype=np.int64)
+        self.dropped = np.zeros(n, dtype=np.int64)
+        self.skew_sum = np.zeros(n)
+        self.skew_max = np.zeros(n)
+
+    def run(self):
+        self.running = True
+        n = len(self.cameras)
+        grabbed = np.zeros(n, dtype=bool)
+        grab_times = np.zeros(n)
+        failures = np.zeros(n, dtype=np.int64)
+        max_failures = np.array([cam.max_failures for cam in self.cameras])
+        idle_delay = 0.001
+        while self.running:
+            for cam in self.cameras:
+                if cam._pending:
+                    cam._apply_pending()
+            for i, cam in enumerate(self.cameras):
+                grabbed[i] = cam.grab()
+                grab_times[i] = cam.grab_time if grabbed[i] else np.nan
+            failures[grabbed] = 0
+            failures[~grabbed] += 1
+            for i in np.flatnonzero(failures >= max_failures):
+                cam = self.cameras[i]
+                if cam.reconnect:
+                    print(f"camera {cam.camera_index} stopped delivering frames, reopening")
+                    cam._reopen()
+                failures[i] = 0
+            if not grabbed.any():
+                self._stop_event.wait(idle_delay)
+                idle_delay = min(2 * idle_delay, self.max_idle_delay)
+                continue
+            idle_delay = 0.001
+            timestamp = np.nanmin(grab_times)
+            skew = grab_times - timestamp
+
+            for i, cam in enumerate(self.cameras):
+                start = time.perf_counter()
+                frame = cam.retrieve() if grabbed[i] else None
+                if frame is None:
+                    self.failed[i] += 1
+                    continue
+                self.frames[i] += 1
+                cam.stats.add(time.perf_counter() - start)
+                self.skew_sum[i] += skew[i]
+                self.skew_max[i] = max(self.skew_max[i], skew[i])
+                cam.deliver(frame, FrameInfo(cam.frame_index, timestamp, cam.pos_msec))
+        for cam in self.cameras:
+            cam.cap.release()
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+
+    def start_recording(self, savepath, buffer_megabytes=1024, policy=BLOCK):
+        # one ring buffer and Writer per camera, camera i writes to <name>_cam<i>.<ext>
+        stem, ext = os.path.splitext(savepath)
+        ext = ext or ".avi"
+        for i, cam in enumerate(self.cameras):
+            w, h = cam.frame_size
+            capacity = frames_for_megabytes(buffer_megabytes / len(self.cameras), (h, w))
+            buffer = FrameRingBuffer(capacity, (h, w), policy=policy)
+            writer = Writer(buffer=buffer, savepath=f"{stem}_cam{i}{ext}",
+                            framerate=cam.actual_framerate, shape=(w, h))
+            cam.add_sink(buffer)
+            writer.start()
+            self.buffers.append(buffer)
+            self.writers.append(writer)
+
+    def stop_recording(self):
+        for cam, buffer in zip(self.cameras, self.buffers):
+            cam.remove_sink(buffer)
+            buffer.close()
+        for writer in self.writers:
+            writer.wait()
+        for i, buffer in enumerate(self.buffers):
+            self.dropped[i] += buffer.dropped
+        self.buffers = []
+        self.writers = []
+
+    def report(self):
+        # per camera capture statistics, skew is relative to the earliest grab of each iteration
+        report = []
+        for i, cam in enumerate(self.cameras):
+            frames = int(self.frames[i])
+            dropped = self.dropped[i] + (self.buffers[i].dropped if self.buffers else 0)
+            report.append({
+                "camera": cam.camera_index,
+                "frames": frames,
+                "failed": int(self.failed[i]),
+                "dropped": int(dropped),
+                "mean_skew_ms": float(1000 * self.skew_sum[i] / frames) if frames else 0.0,
+                "max_skew_ms": float(1000 * self.skew_max[i]),
+            })
+        return report
@@ -0,0 +1,355 @@
+from PyQt5 import QtCore, QtWidgets, QtGui
+from ui.camera_controls_ui import Ui_TileMapWidget as camera_control_ui
+import threading
+from CameraWorker import CameraConnector, CameraScanner
+from FrameBuffer import FrameRingBuffer, frames_for_megabytes, pretrigger_frames, BLOCK, DROP_OLDEST
+from Preview import Preview
+from PreviewServer import PreviewServer
+from Pipeline import Pipeline, make_stage
+from Metrics import Metrics, MetricsLog
+import numpy as np
+from VideoWriter import Writer
+from Scheduler import RecordingSchedule
+
+class CameraWidget(QtWidgets.QDockWidget,camera_control_ui):
+    #memory reserved for frames waiting to be written, and what to do when the writer falls behind
+    buffer_megabytes = 1024
+    buffer_policy = BLOCK
+    #frames from before Record was pressed that are written at the start of a recording, the
+    #smaller of the two limits applies. they are kept in the buffer above and never exceed it
+    pretrigger_seconds = 5
+    pretrigger_megabytes = 512
+    #(x, y, width, height) region of interest and pixel binning applied right after capture
+    roi = None
+    binning = 1
+    #optional rolling output, a new file every segment_seconds/segment_megabytes keeping max_segments
+    segment_seconds = None
+    segment_megabytes = None
+    max_segments = None
+    #processing applied to every frame before preview and writing, e.g. ["background", "timestamp"],
+    #see make_stage in Pipeline.py. runs on processing_workers threads
+    processing = []
+    processing_workers = None
+    #preview redraws per second, independent of the capture framerate
+    preview_rate = 30
+    #port for an MJPEG preview stream over HTTP (see PreviewServer), "0.0.0.0" serves on all interfaces
+    serve_port = None
+    serve_host = "127.0.0.1"
+    #how often the metrics label is refreshed, and an optional .csv/.jsonl file to log them to
+    metrics_interval_ms = 1000
+    metrics_log = None
+
+    def __init__(self):
+        QtWidgets.QDockWidget.__init__(self)
+        camera_control_ui.__init__(self)
+        self.setWindowTitle("Camera Controls")
+        self.ui = camera_control_ui()
+        self.ui.setupUi(self)
+        self.connect_ui()
+
+        self.preview = Preview(display_rate=self.preview_rate)
+        self.preview.signals.signal_preview_changed.connect(self.update_image)
+        self.preview.start()
+        self.server = None
+        if self.serve_port is not None:
+            self.server = PreviewServer(self.serve_port, self.serve_host)
+            self.server.start()
+
+        self.metrics = Metrics()
+        self.metrics_file = MetricsLog(self.metrics_log) if self.metrics_log else None
+        self.metrics_timer = QtCore.QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start(self.metrics_interval_ms)
+
+        #opening, closing and scanning cameras happens on worker threads, see CameraWorker
+        self.cam = None
+        #the camera, or the processing pipeline behind it, that preview and buffer are attached to
+        self.source = None
+        self.pipeline = None
+        self.connector = None
+        self.workers = []
+        #connects to the first camera once the scan is done
+        self.get_available_cameras()
+
+    def connect_ui(self):
+        self.ui.buttonScanCameras.clicked.connect(self.get_available_cameras)
+        self.ui.buttonConnectCamera.clicked.connect(self.connect_camera)
+        self.ui.buttonConnectCamera.setVisible(False)
+        self.ui.comboBoxCameras.currentTextChanged.connect(self.connect_camera)
+        self.ui.checkBoxViewCamera.toggled.connect(self.toggle_view_camera)
+
+
+        for framerate in [10,30,60,120,240]:
+            self.ui.comboBoxFramerate.addItem(str(framerate))
+            self.ui.comboBoxFramerate.setCurrentText("30")
+
+        self.ui.sliderCameraGamma.valueChanged.connect(self.update_camera_gamma)
+        self.ui.sliderCameraBrightness.valueChanged.connect(self.update_camera_brightness)
+        self.ui.buttonSetFramerate.clicked.connect(self.update_camera_framerate)
+
+        self.ui.buttonRecord.clicked.connect(self.toggle_recording)
+
+
+    def start_worker(self, worker):
+        #keep a reference until the thread is done, a QThread must not be destroyed while running
+        self.workers.append(worker)
+        worker.finished.connect(lambda: self.workers.remove(worker))
+        worker.start()
+
+    def get_available_cameras(self):
+        scanner = CameraScanner()
+        scanner.signal_cameras_found.connect(self.update_available_cameras)
+        self.start_worker(scanner)
+
+    def update_available_cameras(self, cameras):
+        self.available_cameras = cameras
+        current = self.ui.comboBoxCameras.currentText()
+        self.ui.comboBoxCameras.blockSignals(True)
+        self.ui.comboBoxCameras.clear()
+        for cam in self.available_cameras:
+            self.ui.comboBoxCameras.addItem(f"{cam} - {self.available_cameras[cam]}")
+        self.ui.comboBoxCameras.setCurrentText(current)
+        self.ui.comboBoxCameras.blockSignals(False)
+        if self.cam is None or self.ui.comboBoxCameras.currentText() != current:
+            self.connect_camera()
+        print(self.available_cameras)
+
+    def connect_camera(self):
+        device_name = self.ui.comboBoxCameras.currentText().split(" ")[0]
+        if not device_name:
+            return
+
+        gamma = self.ui.sliderCameraGamma.value()
+        framerate = int(self.ui.comboBoxFramerate.currentText())
+        brightness = self.ui.sliderCameraBrightness.value()
+        if self.connector is not None:
+            self.connector.cancel()
+        self.connector = CameraConnector(self.cam, device_name, framerate, gamma, brightness,
+                                         roi=self.roi, binning=self.binning)
+        self.connector.signal_camera_opened.connect(self.camera_opened)
+        self.connector.signal_camera_failed.connect(self.camera_failed)
+        self.start_worker(self.connector)
+
+    def camera_opened(self, cam):
+        if self.sender() is not self.connector:
+            #a newer connection was requested in the meantime
+            threading.Thread(target=cam.stop, daemon=True).start()
+            return
+        self.cam = cam
+        self.cam.signals.signal_framerate_changed.connect(self.update_measured_framerate)
+        self.cam.signals.signal_property_changed.connect(self.update_camera_property)
+        self.metrics.camera = self.cam
+        try:
+            self.setup_pipeline()
+            self.setup_buffer()
+        except ValueError as e:
+            #sinks are sized from the camera, e.g. a driver reporting an empty frame size
+            print(f"could not set up camera {cam.camera_index}: {e}")
+            self.close_camera()
+            return
+
+        if self.ui.checkBoxViewCamera.isChecked():
+            self.source.add_sink(self.preview)
+        if self.server is not None:
+            self.source.add_sink(self.server)
+
+        self.cam.start()
+
+    def camera_failed(self, device_name):
+        if self.sender() is not self.connector:
+            return
+        #the connector already closed the previous camera
+        self.close_camera()
+        self.ui.labelFramerate.setText(f"Framerate (could not open {device_name})")
+
+    def close_camera(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+        if self.cam is not None:
+            threading.Thread(target=self.cam.stop, daemon=True).start()
+        self.cam = None
+        self.source = None
+        self.metrics.camera = None
+        self.metrics.pipeline = None
+
+    def setup_pipeline(self):
+        #the previous camera is already stopped, deliver what is still being processed
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
+        self.metrics.pipeline = None
+        self.source = self.cam
+        if not self.processing:
+            return
+        w, h = self.cam.frame_size
+        self.pipeline = Pipeline([make_stage(spec) for spec in self.processing], (h, w),
+                                 workers=self.processing_workers)
+        self.cam.add_sink(self.pipeline)
+        self.pipeline.start()
+        self.metrics.pipeline = self.pipeline
+        self.source = self.pipeline
+
+    def setup_buffer(self):
+        #preallocated buffer between camera and writer, kept filled with the last few seconds
+        #while not recording so the moments before Record was pressed end up in the video
+        w, h = self.cam.frame_size
+        self.n_pretrigger = pretrigger_frames(self.cam.actual_framerate, (h, w),
+                                              self.pretrigger_seconds, self.pretrigger_megabytes)
+        capacity = frames_for_megabytes(self.buffer_megabytes, (h, w))
+        #leave at least one slot for live frames
+        self.n_pretrigger = min(self.n_pretrigger, capacity - 1)
+        self.buffer = FrameRingBuffer(capacity, (h, w), policy=DROP_OLDEST, keep=self.n_pretrigger)
+        self.source.add_sink(self.buffer)
+        self.metrics.buffer = self.buffer
+
+    def arm_pretrigger(self):
+        #the writer has drained the buffer and stopped, it can be filled and recorded from again
+        self.buffer.configure(DROP_OLDEST, keep=self.n_pretrigger)
+        self.buffer.reopen()
+        self.ui.buttonRecord.setText("Record")
+        self.ui.buttonRecord.setEnabled(True)
+
+    def toggle_view_camera(self, view_camera):
+        if self.cam is None:
+            return
+        if view_camera:
+            self.source.add_sink(self.preview)
+            self.ui.labelVideoDisplay.setVisible(True)
+        else:
+            self.source.remove_sink(self.preview)
+            self.ui.labelVideoDisplay.setVisible(False)
+
+    def update_camera_gamma(self, value):
+        self.ui.labelCameraGammaValue.setText(str(value/100.0))
+        if self.cam is not None:
+            self.cam.set_property("gamma", value)
+
+    def update_camera_brightness(self, value):
+        self.ui.labelCameraBrightnessValue.setText(str(value))
+        if self.cam is not None:
+            self.cam.set_property("brightness", value)
+
+    def update_camera_framerate(self):
+        #changed in place by the capture thread, reported back through update_camera_property
+        if self.cam is not None:
+            self.cam.set_property("framerate", int(self.ui.comboBoxFramerate.currentText()))
+
+    @QtCore.pyqtSlot(str, float)
+    def update_camera_property(self, name, value):
+        #values as read back from the driver
+        if name == "framerate":
+            self.ui.labelFramerate.setText(f"Framerate (currently {value})")
+        elif name == "gamma":
+            self.ui.labelCameraGammaValue.setText(str(value/100.0))
+        elif name == "brightness":
+            self.ui.labelCameraBrightnessValue.setText(str(value))
+
+    @QtCore.pyqtSlot(np.ndarray)
+    def update_image(self, frame):
+        qt_img = self.convert_cv_qt(frame)
+        self.ui.labelVideoDisplay.setPixmap(qt_img)
+
+    def convert_cv_qt(self, cv_img):
+        h, w = cv_img.shape
+        ch = 1
+        bytes_per_line = ch * w
+        convert_to_Qt_format = QtGui.QImage(cv_img.data, w, h, bytes_per_line, QtGui.QImage.Format_Grayscale8)
+        #frames arrive already downscaled by the preview thread
+        return QtGui.QPixmap.fromImage(convert_to_Qt_format)
+
+
+    def toggle_recording(self):
+        if self.cam is None:
+            self.ui.buttonRecord.setChecked(False)
+            return
+        if self.ui.buttonRecord.isChecked():
+            #get camera settings to pass writing properties
+            w, h = self.cam.frame_size
+            framerate = self.cam.actual_framerate
+
+            #the pre-trigger buffer becomes the recording buffer, frames already in it are written first
+            self.buffer.configure(self.buffer_policy)
+
+            #retrieve savepath
+            savepath = self.ui.lineEditSaveName.text()
+            if "." not in savepath:
+                savepath += ".avi"
+            self.ui.lineEditSaveName.setText(savepath)
+
+            #get video duration from ui
+            duration_minutes = self.ui.spinBoxDurationMin.value()
+            duration_seconds = self.ui.spinBoxDurationSec.value()
+            self.total_duration = duration_minutes * 60 + duration_seconds
+            #the writer ends the recording on the first frame past the duration, 0 records until stopped
+            schedule = RecordingSchedule(duration=self.total_duration or None)
+
+            #set up a videowriter
+            self.writer = Writer(buffer=self.buffer, savepath = savepath,
+                                 framerate=framerate, shape=(w,h),
+                                 segment_seconds=self.segment_seconds,
+                                 segment_megabytes=self.segment_megabytes,
+                                 max_segments=self.max_segments,
+                                 schedule=schedule)
+            self.writer.signal_writing_stopped.connect(self.arm_pretrigger)
+            self.writer.signal_schedule_finished.connect(self.recording_finished)
+            self.writer.signal_time_progressed.connect(self.update_progress)
+            self.metrics.writer = self.writer
+
+            #start writing video
+            self.writer.start()
+            #update ui
+            self.ui.buttonRecord.setText("Stop Recording")
+            self.ui.buttonRecord.setStyleSheet("color : red")
+            self.ui.labelProgress.setVisible(True)
+            self.ui.progressBarWritingProgress.setValue(0)
+            self.ui.progressBarWritingProgress.setVisible(True)
+        else:
+            self.recording_finished()
+
+    def recording_finished(self):
+        #the writer drains what is left and then stops, see arm_pretrigger. the buffer has a single
+        #consumer, so the next recording can only start after that
+        if self.buffer.closed:
+            return
+        self.buffer.close()
+        self.ui.buttonRecord.setText("Finishing...")
+        self.ui.buttonRecord.setEnabled(False)
+        self.ui.buttonRecord.setStyleSheet("")
+
+        self.ui.labelProgress.setVisible(False)
+        self.ui.progressBarWritingProgress.setVisible(False)
+        self.ui.buttonRecord.setChecked(False)
+
+    @QtCore.pyqtSlot(float)
+    def update_measured_framerate(self, framerate):
+        self.ui.labelFramerate.setText(f"Framerate (measured {framerate:.1f})")
+
+    def update_metrics(self):
+        row = self.metrics.snapshot()
+        self.ui.labelMetrics.setText(Metrics.format(row))
+        if self.metrics_file is not None:
+            self.metrics_file.write(row)
+
+    @QtCore.pyqtSlot(float)
+    def update_progress(self, elapsed):
+        if not self.total_duration:
+            self.ui.labelProgress.setText(f"{np.round(elapsed,2)}")
+            return
+        self.ui.labelProgress.setText(f"{np.round(elapsed,2)} / {self.total_duration}")
+        self.ui.progressBarWritingProgress.setValue(int((elapsed/self.total_duration)*100))
+
+    def closeEvent(self, event):
+        try:
+            self.cam.stop(timeout=1)
+        except:
+            pass
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.preview.stop()
+        if self.server is not None:
+            self.server.stop()
+        if self.metrics_file is not None:
+            self.metrics_file.close()
+        print("goodbye")
+        event.accept()
@@ -0,0 +1,43 @@
+from PyQt5 import QtCore
+from PyQt5.QtMultimedia import QCameraInfo
+from Camera import Camera
+
+class CameraConnector(QtCore.QThread):
+    # Closes the previous camera and opens a new one off the GUI thread, both can take seconds
+    # with some drivers. A connector that was cancelled because a newer connection was requested
+    # closes the camera it opened instead of handing it over, as it does with a device that fails to open.
+    signal_camera_opened = QtCore.pyqtSignal(object)
+    signal_camera_failed = QtCore.pyqtSignal(str)
+
+    def __init__(self, old_camera, *args, **kwargs):
+        QtCore.QThread.__init__(self)
+        self.old_camera = old_camera
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        if self.old_camera is not None:
+            self.old_camera.stop()
+        if self.cancelled:
+            return
+        cam = Camera(*self.args, **self.kwargs)
+        if self.cancelled:
+            cam.stop()
+            return
+        if not cam.cap.isOpened():
+            print(f"could not open camera {cam.camera_index}")
+            cam.stop()
+            self.signal_camera_failed.emit(str(cam.camera_index))
+            return
+        self.signal_camera_opened.emit(cam)
+
+
+class CameraScanner(QtCore.QThread):
+    signal_cameras_found = QtCore.pyqtSignal(dict)
+
+    def run(self):
+        self.signal_cameras_found.emit({c.deviceName() : c.description() for c in QCameraInfo.availableCameras()})
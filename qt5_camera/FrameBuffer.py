@@ -0,0 +1,136 @@
+import numpy as np
+import threading
+from collections import deque
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+
+class FrameRingBuffer:
+    # Fixed capacity buffer of preallocated frames shared between one producer (Camera) and one
+    # consumer (Writer). Slots are handed out by index so the consumer can read a frame in place
+    # and give the slot back with release() once it is done with it.
+    # keep limits how many frames may wait in the buffer, older ones are recycled first. With
+    # DROP_OLDEST this turns the buffer into a pre-trigger buffer holding the last keep frames,
+    # which a Writer attached later drains before continuing with live frames.
+    def __init__(self, capacity, shape, dtype=np.uint8, policy=BLOCK, keep=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.frames = np.empty((capacity,) + tuple(shape), dtype=dtype)
+        self.infos = [None] * capacity
+        self.capacity = capacity
+        self.policy = policy
+        self.keep = keep
+        self.dropped = 0
+        self.closed = False
+        self._free = deque(range(capacity))
+        self._ready = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def policy(self):
+        return self._policy
+
+    @policy.setter
+    def policy(self, policy):
+        if policy not in POLICIES:
+            raise ValueError(f"overflow policy {policy} not supported, use one of {POLICIES}")
+        self._policy = policy
+
+    @property
+    def shape(self):
+        return self.frames.shape[1:]
+
+    def __len__(self):
+        with self._cond:
+            return len(self._ready)
+
+    def put(self, frame, info=None, timeout=None):
+        with self._cond:
+            if self.closed:
+                return False
+            if self.keep is not None:
+                while self._ready and len(self._ready) >= self.keep:
+                    self._free.append(self._ready.popleft())
+                if self.keep == 0:
+                    return False
+            slot = self._acquire(timeout)
+            if slot is None:
+                self.dropped += 1
+                return False
+        np.copyto(self.frames[slot], frame)
+        self.infos[slot] = info
+        with self._cond:
+            self._ready.append(slot)
+            self._cond.notify_all()
+        return True
+
+    def _acquire(self, timeout):
+        if self._free:
+            return self._free.popleft()
+        if self.policy == BLOCK:
+            if self._cond.wait_for(lambda: self._free or self.closed, timeout) and not self.closed:
+                return self._free.popleft()
+            return None
+        if self.policy == DROP_OLDEST and self._ready:
+            self.dropped += 1
+            return self._ready.popleft()
+        return None
+
+    def get(self, timeout=None):
+        # returns (slot, frame, info) where frame is a view into the buffer, or None once the buffer is
+        # closed and drained (or on timeout)
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ready or self.closed, timeout):
+                return None
+            if not self._ready:
+                return None
+            slot = self._ready.popleft()
+        return slot, self.frames[slot], self.infos[slot]
+
+    def release(self, slot):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify_all()
+
+    def configure(self, policy, keep=None):
+        # switch overflow policy and pre-trigger length in place, resets the drop counter
+        with self._cond:
+            self.policy = policy
+            self.keep = keep
+            self.dropped = 0
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        with self._cond:
+            self.closed = False
+
+
+def frame_bytes(shape, dtype=np.uint8):
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if size <= 0:
+        #e.g. frame_size of a capture that is not open
+        raise ValueError(f"frame shape {tuple(shape)} is empty")
+    return size
+
+
+def frames_for_megabytes(megabytes, shape, dtype=np.uint8):
+    return max(1, int(megabytes * 1e6 // frame_bytes(shape, dtype)))
+
+
+def pretrigger_frames(framerate, shape, seconds=None, megabytes=None, dtype=np.uint8):
+    # number of frames covering a pre-trigger length given in seconds and/or megabytes,
+    # the smaller one wins when both are given
+    frames = []
+    if seconds is not None:
+        frames.append(int(round(seconds * framerate)))
+    if megabytes is not None:
+        frames.append(int(megabytes * 1e6 // frame_bytes(shape, dtype)))
+    return max(0, min(frames)) if frames else 0
@@ -0,0 +1,134 @@
+import argparse
+import time
+from Camera import Camera, CAPTURE_MODES
+from FrameBuffer import FrameRingBuffer, frames_for_megabytes, POLICIES, BLOCK
+from VideoWriter import Writer
+from Scheduler import RecordingSchedule
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog="qt5_camera record",
+                                     description="Record from a camera without the GUI.")
+    parser.add_argument("--device", default="0", help="camera index, device path or synthetic[:fps=..,entropy=..]")
+    parser.add_argument("--duration", type=float, default=None, help="recording length in seconds")
+    parser.add_argument("--frames", type=int, default=None, help="stop after writing exactly N frames")
+    parser.add_argument("--start-at", type=float, default=None, help="start at this unix time (seconds)")
+    parser.add_argument("--repeat", type=int, default=1, help="number of captures, each to its own file")
+    parser.add_argument("--interval", type=float, default=None, help="seconds between the starts of captures")
+    parser.add_argument("--keep-every", type=int, default=1, help="time-lapse, write only every N-th frame")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--out", default="Video001.avi", help=".avi, .mp4 or .raw (lossless)")
+    parser.add_argument("--width", type=int, default=7680)
+    parser.add_argument("--height", type=int, default=4320)
+    parser.add_argument("--gamma", type=float, default=100)
+    parser.add_argument("--brightness", type=float, default=100)
+    parser.add_argument("--roi", default=None, help="x,y,width,height region of interest in sensor pixels")
+    parser.add_argument("--binning", type=int, default=1, help="average NxN pixel blocks, e.g. 2 or 4")
+    parser.add_argument("--capture-mode", choices=CAPTURE_MODES, default="bgr")
+    parser.add_argument("--buffer-mb", type=float, default=1024, help="memory for frames waiting to be written")
+    parser.add_argument("--policy", choices=POLICIES, default=BLOCK, help="what to do when the buffer is full")
+    parser.add_argument("--encoder", choices=("serial", "parallel"), default="serial")
+    parser.add_argument("--workers", type=int, default=None, help="processes for the parallel encoder")
+    parser.add_argument("--parallel-mb", type=float, default=None,
+                        help="shared memory for the parallel encoder, default a quarter of the RAM")
+    parser.add_argument("--segment-seconds", type=float, default=None, help="start a new file every N seconds")
+    parser.add_argument("--segment-mb", type=float, default=None, help="start a new file every N megabytes")
+    parser.add_argument("--max-segments", type=int, default=None, help="only keep the newest N files")
+    parser.add_argument("--process", action="append", default=[], metavar="STAGE[:IMAGE]",
+                        help="processing stage applied before writing, repeat for several: "
+                             "background[:bg.png], flatfield:flat.png, stretch, timestamp")
+    parser.add_argument("--process-workers", type=int, default=None, help="threads for the processing stages")
+    parser.add_argument("--serve", type=int, default=None, metavar="PORT",
+                        help="stream an MJPEG preview over HTTP on this port")
+    parser.add_argument("--serve-host", default="127.0.0.1", help="address to serve the preview on, 0.0.0.0 for all")
+    parser.add_argument("--metrics", default=None, help="log metrics every second to this .csv/.jsonl file")
+    parser.add_argument("--motion-threshold", type=float, default=None,
+                        help="only record while the mean frame difference exceeds this value")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.duration is None and args.frames is None:
+        print("give --duration and/or --frames")
+        return 1
+    device = int(args.device) if args.device.isdigit() else args.device
+
+    roi = tuple(int(v) for v in args.roi.split(",")) if args.roi else None
+    cam = Camera(device, args.fps, args.gamma, args.brightness, shape=(args.width, args.height),
+                 capture_mode=args.capture_mode, roi=roi, binning=args.binning)
+    if not cam.cap.isOpened():
+        print(f"could not open camera {args.device}")
+        return 1
+    w, h = cam.frame_size
+    buffer = FrameRingBuffer(frames_for_megabytes(args.buffer_mb, (h, w)), (h, w), policy=args.policy)
+    pipeline = None
+    if args.process:
+        from Pipeline import Pipeline, make_stage
+        try:
+            stages = [make_stage(spec) for spec in args.process]
+            pipeline = Pipeline(stages, (h, w), workers=args.process_workers)
+        except ValueError as e:
+            print(e)
+            cam.stop()
+            return 1
+        pipeline.add_sink(buffer)
+        cam.add_sink(pipeline)
+    else:
+        cam.add_sink(buffer)
+    server = None
+    if args.serve is not None:
+        from PreviewServer import PreviewServer
+        server = PreviewServer(args.serve, args.serve_host)
+        (pipeline or cam).add_sink(server)
+        server.start()
+
+    trigger = None
+    if args.motion_threshold is not None:
+        from Trigger import MotionTrigger
+        trigger = MotionTrigger(on_threshold=args.motion_threshold)
+    framerate = cam.actual_framerate or args.fps
+    schedule = RecordingSchedule(duration=args.duration, max_frames=args.frames, start_at=args.start_at,
+                                 repeat=args.repeat, interval=args.interval, keep_every=args.keep_every)
+    try:
+        writer = Writer(buffer=buffer, savepath=args.out, framerate=framerate, shape=(w, h),
+                        encoder=args.encoder, workers=args.workers,
+                        parallel_megabytes=args.parallel_mb, trigger=trigger,
+                        segment_seconds=args.segment_seconds, segment_megabytes=args.segment_mb,
+                        max_segments=args.max_segments, schedule=schedule)
+    except ValueError as e:
+        print(e)
+        cam.stop()
+        return 1
+
+    logger = None
+    if args.metrics:
+        from Metrics import Metrics, MetricsLogger
+        logger = MetricsLogger(Metrics(cam, buffer, writer, pipeline), args.metrics)
+        logger.start()
+
+    print(f"recording {w}x{h} at {framerate} fps to {args.out}")
+    writer.start()
+    if pipeline is not None:
+        pipeline.start()
+    cam.start()
+    try:
+        #the writer decides per frame when the schedule is complete, the deadline covers a camera
+        #that stopped delivering frames
+        deadline = schedule.deadline()
+        while not writer.done.wait(0.1):
+            if deadline is not None and time.monotonic() > deadline + 1.0:
+                print("no frames past the end of the schedule, stopping")
+                break
+    except KeyboardInterrupt:
+        print("interrupted")
+    cam.stop()
+    if pipeline is not None:
+        pipeline.stop()
+    buffer.close()
+    writer.wait()
+    if server is not None:
+        server.stop()
+    if logger is not None:
+        logger.stop()
+        logger.join()
+    return 0
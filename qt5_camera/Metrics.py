@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+
+class StageStats:
+    # running totals for one stage (capture, writing). Only the stage's own thread updates them,
+    # readers take the difference between two snapshots
+    def __init__(self):
+        self.count = 0
+        self.busy = 0.0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+    def add(self, duration, lag=None):
+        self.count += 1
+        self.busy += duration
+        if lag is not None:
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+
+class Metrics:
+    # Collects the counters of a camera, its processing pipeline, its ring buffer and the current
+    # writer into one row.
+    # Rates and per-frame times are averaged over the interval since the previous snapshot().
+    fields = ["time", "capture_fps", "capture_ms", "buffer_depth", "buffer_capacity", "dropped",
+              "write_fps", "encode_ms", "writer_lag_ms", "process_fps", "process_ms", "pipeline_depth",
+              "pipeline_capacity", "pipeline_dropped", "pipeline_lag_ms"]
+
+    def __init__(self, camera=None, buffer=None, writer=None, pipeline=None):
+        self.camera = camera
+        self.buffer = buffer
+        self.writer = writer
+        self.pipeline = pipeline
+        self._last = {}
+        self._last_time = time.monotonic()
+
+    def _rate(self, name, stats, dt):
+        count, busy = stats.count, stats.busy
+        last_count, last_busy = self._last.get(name, (0, 0.0))
+        if count < last_count:
+            #stage was replaced, e.g. a new writer
+            last_count, last_busy = 0, 0.0
+        self._last[name] = (count, busy)
+        frames = count - last_count
+        return frames / dt, 1000 * (busy - last_busy) / frames if frames else 0.0
+
+    def snapshot(self):
+        now = time.monotonic()
+        dt = max(now - self._last_time, 1e-9)
+        self._last_time = now
+        row = dict.fromkeys(self.fields, 0)
+        row["time"] = time.time()
+        if self.camera is not None:
+            row["capture_fps"], row["capture_ms"] = self._rate("camera", self.camera.stats, dt)
+        if self.buffer is not None:
+            row["buffer_depth"] = len(self.buffer)
+            row["buffer_capacity"] = self.buffer.capacity
+            row["dropped"] = self.buffer.dropped
+        if self.writer is not None:
+            row["write_fps"], row["encode_ms"] = self._rate("writer", self.writer.stats, dt)
+            row["writer_lag_ms"] = 1000 * self.writer.stats.lag
+        if self.pipeline is not None:
+            row["process_fps"], row["process_ms"] = self._rate("pipeline", self.pipeline.stats, dt)
+            row["pipeline_depth"] = len(self.pipeline)
+            row["pipeline_capacity"] = self.pipeline.max_in_flight
+            row["pipeline_dropped"] = self.pipeline.dropped
+            row["pipeline_lag_ms"] = 1000 * self.pipeline.stats.lag
+        return row
+
+    @staticmethod
+    def format(row):
+        processing = ""
+        if row["pipeline_capacity"]:
+            processing = (f"processing {row['process_fps']:.1f} fps, {row['process_ms']:.2f} ms/frame, "
+                          f"{row['pipeline_depth']}/{row['pipeline_capacity']} in flight, "
+                          f"{row['pipeline_dropped']} dropped\n")
+        return (f"capture {row['capture_fps']:.1f} fps, {row['capture_ms']:.2f} ms/frame\n"
+                f"{processing}"
+                f"buffer {row['buffer_depth']}/{row['buffer_capacity']}, {row['dropped']} dropped\n"
+                f"writer {row['write_fps']:.1f} fps, {row['encode_ms']:.2f} ms/frame, "
+                f"lag {row['writer_lag_ms']:.0f} ms")
+
+
+class MetricsLog:
+    # appends snapshot rows to a .csv file, or to any other path as one json object per line
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.lower().endswith(".csv")
+        self.file = open(path, "w", buffering=1)
+        if self.csv:
+            self.file.write(",".join(Metrics.fields) + "\n")
+
+    def write(self, row):
+        if self.csv:
+            self.file.write(",".join(str(row[f]) for f in Metrics.fields) + "\n")
+        else:
+            self.file.write(json.dumps(row) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class MetricsLogger(threading.Thread):
+    # writes a snapshot every interval seconds, for use without the GUI
+    def __init__(self, metrics, path, interval=1.0):
+        threading.Thread.__init__(self, daemon=True)
+        self.metrics = metrics
+        self.log = MetricsLog(path)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.metrics.snapshot()
+        while not self._stop_event.wait(self.interval):
+            self.log.write(self.metrics.snapshot())
+        self.log.close()
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,137 @@
+import cv2
+import numpy as np
+import os
+import shutil
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+def _encode_segment(shm_name, n_frames, frame_shape, path, fourcc, framerate):
+    # runs in a worker process: encode n_frames grayscale frames from a shared memory block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frames = np.ndarray((n_frames,) + frame_shape, dtype=np.uint8, buffer=shm.buf)
+        h, w = frame_shape
+        out = cv2.VideoWriter(path, fourcc, framerate, (w, h), isColor=False)
+        for frame in frames:
+            out.write(frame)
+        out.release()
+        del frames
+    finally:
+        shm.close()
+    return path
+
+
+def default_megabytes():
+    # a quarter of the physical memory
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 4e6
+    except (ValueError, OSError, AttributeError):
+        return 2048
+
+
+class ParallelVideoWriter:
+    # Drop-in for cv2.VideoWriter (write/release) that cuts the stream into fixed length segments
+    # and encodes them in a pool of worker processes. Frames are copied once into shared memory
+    # blocks which are reused as soon as their segment is encoded. On release the segments are
+    # joined into savepath with ffmpeg's concat demuxer (stream copy, no re-encode) when ffmpeg is
+    # available, otherwise they are kept next to an ffconcat playlist <savepath>.ffconcat.
+    # Segments are at least min_segment_seconds long, every segment starts with a keyframe and
+    # becomes a file. max_megabytes bounds the shared memory, by default a quarter of the physical
+    # memory. When it does not hold a block per worker fewer segments are encoded at a time instead
+    # of making them shorter, a budget too small for two blocks raises ValueError.
+    def __init__(self, savepath, fourcc, framerate, shape, workers=None, segment_frames=None,
+                 max_megabytes=None, min_segment_seconds=1.0):
+        self.savepath = savepath
+        self.fourcc = fourcc
+        self.framerate = framerate
+        w, h = shape
+        self.frame_shape = (h, w)
+        workers = workers or os.cpu_count()
+        if max_megabytes is None:
+            max_megabytes = default_megabytes()
+        min_frames = max(1, int(round(min_segment_seconds * (framerate or 30))))
+        if segment_frames is None:
+            segment_frames = max(min_frames, int(max_megabytes * 1e6 // ((workers + 1) * w * h)))
+        self.segment_frames = segment_frames
+        #one block being filled plus one per segment being encoded, at least two to keep filling
+        #while the previous segment encodes
+        n_blocks = min(workers + 1, int(max_megabytes * 1e6 // (segment_frames * w * h)))
+        if n_blocks < 2:
+            raise ValueError(f"the parallel encoder needs at least {2 * segment_frames * w * h / 1e6:.0f} MB "
+                             f"for {segment_frames} frame segments of {w}x{h}, max_megabytes is {max_megabytes:.0f}")
+        self.workers = n_blocks - 1
+
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self._blocks = [shared_memory.SharedMemory(create=True, size=segment_frames * w * h)
+                        for _ in range(n_blocks)]
+        self._free = list(range(n_blocks))
+        self._pending = []
+        self.segments = []
+        self._block = None
+        self._n = 0
+
+    def isOpened(self):
+        return True
+
+    def write(self, frame):
+        if self._block is None:
+            self._block = self._next_block()
+            self._n = 0
+        self._frames[self._n] = frame
+        self._n += 1
+        if self._n == self.segment_frames:
+            self._submit()
+
+    def _next_block(self):
+        if not self._free:
+            #all blocks are being encoded, wait for the oldest segment
+            future, block = self._pending.pop(0)
+            future.result()
+            self._free.append(block)
+        block = self._free.pop()
+        self._frames = np.ndarray((self.segment_frames,) + self.frame_shape, dtype=np.uint8,
+                                  buffer=self._blocks[block].buf)
+        return block
+
+    def _submit(self):
+        stem, ext = os.path.splitext(self.savepath)
+        path = f"{stem}.{len(self.segments):05d}{ext}"
+        future = self.pool.submit(_encode_segment, self._blocks[self._block].name, self._n,
+                                  self.frame_shape, path, self.fourcc, self.framerate)
+        self.segments.append(path)
+        self._pending.append((future, self._block))
+        self._block = None
+
+    def release(self):
+        if self._block is not None and self._n:
+            self._submit()
+        for future, block in self._pending:
+            future.result()
+        self._pending = []
+        self.pool.shutdown()
+        self._frames = None
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+        self._join_segments()
+
+    def _join_segments(self):
+        playlist = self.savepath + ".ffconcat"
+        with open(playlist, "w") as f:
+            f.write("ffconcat version 1.0\n")
+            for path in self.segments:
+                f.write(f"file '{os.path.basename(path)}'\n")
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None or not self.segments:
+            return
+        result = subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                                 "-i", playlist, "-c", "copy", self.savepath])
+        if result.returncode == 0:
+            for path in self.segments:
+                os.remove(path)
+            os.remove(playlist)
+        else:
+            print(f"joining segments failed, segments are listed in {playlist}")
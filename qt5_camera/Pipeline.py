@@ -0,0 +1,220 @@
+import cv2
+import numpy as np
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from Metrics import StageStats
+
+class Pipeline(threading.Thread):
+    # Camera sink that runs processing stages on a thread pool and hands the results to its own
+    # sinks (Preview, FrameRingBuffer, ...) in capture order, on the pipeline thread.
+    # A stage is any callable stage(frame, info) working on a 2d frame. It may change the frame in
+    # place and return None, or return a new array of the same shape which is copied back.
+    # Each frame runs through all stages on one worker, several frames are processed at once, so
+    # stages must not depend on the previous frame. OpenCV and numpy release the GIL, the workers
+    # scale across cores.
+    # Frames are copied into a fixed pool of slots on arrival, at most max_in_flight are processed
+    # at a time. With block=True put() waits for a free slot, otherwise the frame is counted in
+    # dropped. spare slots keep delivered frames valid for a while for sinks holding a reference,
+    # frames a stage failed on are counted in dropped as well.
+    # Stages working with a reference image have a shape attribute, checked against the frames here.
+    def __init__(self, stages, shape, dtype=np.uint8, workers=None, max_in_flight=None, block=True, spare=3):
+        threading.Thread.__init__(self, daemon=True)
+        for stage in stages:
+            stage_shape = getattr(stage, "shape", None)
+            if stage_shape is not None and tuple(stage_shape) != tuple(shape):
+                raise ValueError(f"{type(stage).__name__} image is {stage_shape[1]}x{stage_shape[0]}, "
+                                 f"frames are {shape[1]}x{shape[0]}")
+        self.stages = list(stages)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.block = block
+        self.sinks = []
+        self.running = False
+        self.dropped = 0
+        self.stats = StageStats()
+        self.frames = np.empty((self.max_in_flight + spare,) + tuple(shape), dtype=dtype)
+        #free slots are reused oldest first, so the last delivered frames stay untouched longest
+        self._free = deque(range(len(self.frames)))
+        self._in_flight = deque()
+        #slots taken by put() but not yet submitted
+        self._reserved = 0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="pipeline")
+
+    @property
+    def shape(self):
+        return self.frames.shape[1:]
+
+    def __len__(self):
+        # frames being processed or waiting to be delivered
+        with self._cond:
+            return len(self._in_flight) + self._reserved
+
+    def add_sink(self, sink):
+        self.sinks = self.sinks + [sink]
+
+    def remove_sink(self, sink):
+        self.sinks = [s for s in self.sinks if s is not sink]
+
+    def put(self, frame, info=None):
+        # called on the capture thread
+        with self._cond:
+            if not self.running:
+                return False
+            if len(self._in_flight) + self._reserved >= self.max_in_flight and not self.block:
+                self.dropped += 1
+                return False
+            self._cond.wait_for(lambda: len(self._in_flight) + self._reserved < self.max_in_flight
+                                or not self.running)
+            if not self.running:
+                return False
+            slot = self._free.popleft()
+            self._reserved += 1
+        np.copyto(self.frames[slot], frame)
+        future = self._executor.submit(self.process, slot, info)
+        with self._cond:
+            self._reserved -= 1
+            self._in_flight.append((slot, info, future))
+            self._cond.notify_all()
+        return True
+
+    def process(self, slot, info):
+        start = time.perf_counter()
+        frame = self.frames[slot]
+        for stage in self.stages:
+            out = stage(frame, info)
+            if out is not None and out is not frame:
+                np.copyto(frame, out)
+        return time.perf_counter() - start
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._in_flight or (not self.running and not self._reserved))
+                if not self._in_flight:
+                    break
+                slot, info, future = self._in_flight[0]
+            try:
+                duration = future.result()
+            except Exception as e:
+                print(f"processing frame {info.index if info else '?'} failed: {e}")
+                self.dropped += 1
+            else:
+                self.stats.add(duration, time.monotonic() - info.timestamp if info else None)
+                for sink in self.sinks:
+                    sink.put(self.frames[slot], info)
+            with self._cond:
+                self._in_flight.popleft()
+                self._free.append(slot)
+                self._cond.notify_all()
+        self._executor.shutdown()
+
+    def start(self):
+        #accept frames as soon as start() returns
+        self.running = True
+        threading.Thread.start(self)
+
+    def stop(self):
+        # finishes and delivers the frames already in flight, stop the camera first
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join()
+
+
+class BackgroundSubtraction:
+    # absolute difference to a background image, the first processed frame if none is given.
+    # reset() takes the next frame as the new background
+    def __init__(self, background=None):
+        self.background = background
+        self._lock = threading.Lock()
+
+    @property
+    def shape(self):
+        return None if self.background is None else self.background.shape
+
+    def reset(self):
+        self.background = None
+
+    def __call__(self, frame, info=None):
+        if self.background is None:
+            with self._lock:
+                if self.background is None:
+                    self.background = frame.copy()
+                    frame[...] = 0
+                    return
+        cv2.absdiff(frame, self.background, dst=frame)
+
+
+class FlatField:
+    # (frame - dark) * mean(flat - dark) / (flat - dark), the gain image is computed once
+    def __init__(self, flat, dark=None):
+        flat = flat.astype(np.float32)
+        if dark is not None:
+            flat -= dark
+        flat = np.maximum(flat, 1.0)
+        self.gain = (flat.mean() / flat).astype(np.float32)
+        self.dark = dark
+
+    @property
+    def shape(self):
+        return self.gain.shape
+
+    def __call__(self, frame, info=None):
+        if self.dark is not None:
+            cv2.subtract(frame, self.dark, dst=frame)
+        cv2.multiply(frame, self.gain, dst=frame, dtype=cv2.CV_8U)
+
+
+class ContrastStretch:
+    # maps the low/high percentile of every frame to 0/255, percentiles are taken on a decimated view
+    def __init__(self, low=1.0, high=99.0, decimate=8):
+        self.low = low
+        self.high = high
+        self.decimate = decimate
+        self._levels = np.arange(256, dtype=np.float32)
+
+    def __call__(self, frame, info=None):
+        lo, hi = np.percentile(frame[::self.decimate, ::self.decimate], (self.low, self.high))
+        if hi <= lo:
+            return
+        lut = np.clip((self._levels - lo) * (255.0 / (hi - lo)), 0, 255).astype(np.uint8)
+        cv2.LUT(frame, lut, dst=frame)
+
+
+class TimestampOverlay:
+    # writes the frame index and the wall clock capture time into the top left corner
+    def __init__(self, origin=(10, 30), scale=1.0):
+        self.origin = origin
+        self.scale = scale
+        #FrameInfo timestamps are time.monotonic()
+        self._offset = time.time() - time.monotonic()
+
+    def __call__(self, frame, info=None):
+        if info is None:
+            return
+        wall = info.timestamp + self._offset
+        text = f"{info.index} {time.strftime('%H:%M:%S', time.localtime(wall))}.{int(wall * 1000) % 1000:03d}"
+        thickness = max(1, int(2 * self.scale))
+        cv2.putText(frame, text, self.origin, cv2.FONT_HERSHEY_SIMPLEX, self.scale, 0, thickness + 2)
+        cv2.putText(frame, text, self.origin, cv2.FONT_HERSHEY_SIMPLEX, self.scale, 255, thickness)
+
+
+STAGES = {"background": BackgroundSubtraction, "flatfield": FlatField,
+          "stretch": ContrastStretch, "timestamp": TimestampOverlay}
+
+def make_stage(spec):
+    # "name" or "name:image.png", the image is the background or flat field
+    name, _, path = spec.partition(":")
+    if name not in STAGES:
+        raise ValueError(f"processing stage {name} not supported, use one of {', '.join(STAGES)}")
+    if not path:
+        return STAGES[name]()
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"could not read {path}")
+    return STAGES[name](image)
@@ -0,0 +1,85 @@
+import cv2
+import numpy as np
+from PyQt5 import QtCore
+import threading
+import time
+
+class PreviewSignals(QtCore.QObject):
+    signal_preview_changed = QtCore.pyqtSignal(np.ndarray)
+
+class Preview(threading.Thread):
+    # Camera sink that downscales the newest frame for display at a fixed rate on its own thread.
+    # Frames arriving faster than display_rate are skipped, so the GUI only ever receives small
+    # images and never slows down capture.
+    def __init__(self, display_rate=30, max_size=(1200, 1080)):
+        threading.Thread.__init__(self, daemon=True)
+        self.signals = PreviewSignals()
+        self.display_rate = display_rate
+        self.max_size = max_size
+        self.running = False
+        #set by the preview thread when it is ready for the next frame, see put
+        self._wanted = False
+        self._input = None
+        self._size = None
+        self._new_frame = threading.Event()
+        #reused output buffer, publish hands out copies
+        self._output = None
+
+    def put(self, frame, info=None):
+        # called on the capture thread. the camera reuses its buffers after a few frames, so the frame
+        # is copied, decimated to at most twice the display size to keep the copy cheap, and only
+        # when the preview thread is done with the previous one
+        if not self._wanted:
+            return
+        self._wanted = False
+        h, w = frame.shape[:2]
+        max_w, max_h = self.max_size
+        scale = min(max_w / w, max_h / h, 1.0)
+        #integer decimation is only a strided view, area interpolation does the rest later
+        step = max(1, int(1 / scale))
+        decimated = frame[::step, ::step]
+        if self._input is None or self._input.shape != decimated.shape:
+            self._input = np.empty_like(decimated)
+        np.copyto(self._input, decimated)
+        self._size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        self._new_frame.set()
+
+    def stop(self):
+        self.running = False
+        self._new_frame.set()
+
+    def run(self):
+        self.running = True
+        self._wanted = True
+        next_time = time.monotonic()
+        while self.running:
+            if not self._new_frame.wait(0.1):
+                continue
+            self._new_frame.clear()
+            if self._input is None or not self.running:
+                continue
+            self.publish(self.downscale(self._input, self._size))
+
+            next_time += 1.0 / self.display_rate
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_time = time.monotonic()
+            self._wanted = True
+
+    def publish(self, image):
+        #the queued signal is handled whenever the GUI gets to it, hand over a copy so the next
+        #downscale cannot overwrite the image while it is being drawn
+        self.signals.signal_preview_changed.emit(image.copy())
+
+    def downscale(self, frame, size):
+        out_shape = (size[1], size[0]) + frame.shape[2:]
+        if self._output is None or self._output.shape != out_shape:
+            self._output = np.empty(out_shape, dtype=frame.dtype)
+        out = self._output
+        if frame.shape[:2] == out_shape[:2]:
+            np.copyto(out, frame)
+        else:
+            cv2.resize(frame, size, dst=out, interpolation=cv2.INTER_AREA)
+        return out
@@ -0,0 +1,120 @@
+import cv2
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from Preview import Preview
+
+PAGE = b"""<html><head><title>qt5_camera</title></head>
+<body style="margin:0;background:#000"><img src="/stream" style="max-width:100%"></body></html>"""
+
+class PreviewServer(Preview):
+    # Camera sink streaming the preview as MJPEG over HTTP, for watching a rig from another machine.
+    #   http://host:port/          page showing the stream
+    #   http://host:port/stream    multipart/x-mixed-replace MJPEG stream
+    #   http://host:port/snapshot  the latest frame as a single JPEG
+    # Frames are downscaled and JPEG encoded once, at most display_rate times per second and only
+    # while someone is watching, then shared by all clients. Each client sends the newest frame
+    # when its connection is ready for it, so slow clients skip frames instead of queueing them.
+    def __init__(self, port=8080, host="127.0.0.1", display_rate=15, max_size=(1280, 720), quality=80):
+        Preview.__init__(self, display_rate=display_rate, max_size=max_size)
+        self.quality = quality
+        self.clients = 0
+        self.jpeg = None
+        self.sequence = 0
+        self._cond = threading.Condition()
+        self.httpd = ThreadingHTTPServer((host, port), PreviewRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.preview = self
+        self.address = self.httpd.server_address
+
+    def put(self, frame, info=None):
+        if self.clients:
+            Preview.put(self, frame, info)
+
+    def publish(self, image):
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return
+        with self._cond:
+            self.jpeg = jpeg.tobytes()
+            self.sequence += 1
+            self._cond.notify_all()
+
+    def next_jpeg(self, sequence, timeout=1.0):
+        # newest jpeg and its sequence number once there is one newer than sequence, None on timeout
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.sequence != sequence or not self.running, timeout):
+                return None, sequence
+            if not self.running:
+                return None, sequence
+            return self.jpeg, self.sequence
+
+    def run(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        print(f"preview stream at http://{self.address[0]}:{self.address[1]}/")
+        Preview.run(self)
+
+    def stop(self):
+        Preview.stop(self)
+        with self._cond:
+            self._cond.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class PreviewRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        preview = self.server.preview
+        if self.path == "/":
+            self.send_bytes("text/html", PAGE)
+        elif self.path == "/snapshot":
+            self.count_client(1)
+            try:
+                #nothing is encoded while nobody watches, wait for a current frame
+                jpeg, _ = preview.next_jpeg(preview.sequence, timeout=5.0)
+            finally:
+                self.count_client(-1)
+            if jpeg is None:
+                self.send_error(503, "no frames")
+            else:
+                self.send_bytes("image/jpeg", jpeg)
+        elif self.path == "/stream":
+            self.stream()
+        else:
+            self.send_error(404)
+
+    def send_bytes(self, content_type, data):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def count_client(self, n):
+        preview = self.server.preview
+        with preview._cond:
+            preview.clients += n
+
+    def stream(self):
+        preview = self.server.preview
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.count_client(1)
+        sequence = -1
+        try:
+            while preview.running:
+                jpeg, sequence = preview.next_jpeg(sequence)
+                if jpeg is None:
+                    continue
+                self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.count_client(-1)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,155 @@
+import numpy as np
+import glob
+import os
+
+# Lossless recordings are stored as a series of chunk files <stem>.00000.raw, <stem>.00001.raw ...
+# Each chunk starts with a page sized header followed by the frames, so frames stay page aligned
+# and the data part can be memory mapped directly.
+MAGIC = b"QT5RAW01"
+HEADER_SIZE = 4096
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("height", "<u4"), ("width", "<u4"), ("dtype", "S8"),
+                         ("fps", "<f8"), ("frame_count", "<u8")])
+
+
+def chunk_path(savepath, i):
+    stem, ext = os.path.splitext(savepath)
+    return f"{stem}.{i:05d}{ext}"
+
+
+def chunk_paths(savepath):
+    stem, ext = os.path.splitext(savepath)
+    return sorted(glob.glob(glob.escape(stem) + ".[0-9][0-9][0-9][0-9][0-9]" + ext))
+
+
+def read_header(path):
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+    if header["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a raw recording")
+    return header
+
+
+class RawVideoWriter:
+    # cv2.VideoWriter compatible writer (write/release) for uncompressed frames. Chunk files are
+    # preallocated to chunk_frames frames and written through a memory map; the frame count in the
+    # header is updated with every frame so a chunk stays readable if the process dies.
+    def __init__(self, savepath, framerate, shape, dtype=np.uint8, chunk_frames=None, chunk_megabytes=1024):
+        self.savepath = savepath
+        self.framerate = framerate
+        w, h = shape
+        self.frame_shape = (h, w)
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = h * w * self.dtype.itemsize
+        if chunk_frames is None:
+            chunk_frames = max(1, int(chunk_megabytes * 1e6 // self.frame_bytes))
+        self.chunk_frames = chunk_frames
+        self.chunks = []
+        self.frame_count = 0
+        self._frames = None
+        self._header = None
+        self._n = 0
+
+    def isOpened(self):
+        return True
+
+    def write(self, frame):
+        if self._frames is None:
+            self._open_chunk()
+        self._frames[self._n] = frame
+        self._n += 1
+        self.frame_count += 1
+        self._header["frame_count"] = self._n
+        if self._n == self.chunk_frames:
+            self._close_chunk()
+
+    def _open_chunk(self):
+        path = chunk_path(self.savepath, len(self.chunks))
+        size = HEADER_SIZE + self.chunk_frames * self.frame_bytes
+        with open(path, "wb") as f:
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(f.fileno(), 0, size)
+            else:
+                f.truncate(size)
+        self._header = np.memmap(path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))[0]
+        self._header["magic"] = MAGIC
+        self._header["height"], self._header["width"] = self.frame_shape
+        self._header["dtype"] = self.dtype.str.encode()
+        self._header["fps"] = self.framerate
+        self._header["frame_count"] = 0
+        self._frames = np.memmap(path, dtype=self.dtype, mode="r+", offset=HEADER_SIZE,
+                                 shape=(self.chunk_frames,) + self.frame_shape)
+        self.chunks.append(path)
+        self._n = 0
+
+    def _close_chunk(self):
+        self._frames.flush()
+        self._frames = None
+        self._header = None
+        #give back the preallocated space of a partially filled chunk
+        with open(self.chunks[-1], "r+b") as f:
+            f.truncate(HEADER_SIZE + self._n * self.frame_bytes)
+
+    def release(self):
+        if self._frames is not None:
+            self._close_chunk()
+
+
+class RawVideoReader:
+    # Read-only view of a raw recording that indexes like a (frames, height, width) numpy array.
+    # Chunks are memory mapped, only the frames that are indexed are read from disk.
+    def __init__(self, path):
+        # path is the savepath given to the writer, or a single chunk file
+        paths = chunk_paths(path)
+        if not paths and os.path.exists(path):
+            paths = [path]
+        if not paths:
+            raise FileNotFoundError(f"no raw recording found for {path}")
+        self.chunks = []
+        for p in paths:
+            header = read_header(p)
+            n = int(header["frame_count"])
+            shape = (n, int(header["height"]), int(header["width"]))
+            if n:
+                self.chunks.append(np.memmap(p, dtype=np.dtype(header["dtype"].decode()), mode="r",
+                                             offset=HEADER_SIZE, shape=shape))
+        first = read_header(paths[0])
+        self.fps = float(first["fps"])
+        self.frame_shape = (int(first["height"]), int(first["width"]))
+        self.dtype = np.dtype(first["dtype"].decode())
+        self._starts = np.cumsum([0] + [len(c) for c in self.chunks])
+
+    def __len__(self):
+        return int(self._starts[-1])
+
+    @property
+    def shape(self):
+        return (len(self),) + self.frame_shape
+
+    def _frame(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"frame {i} out of range for recording with {len(self)} frames")
+        c = int(np.searchsorted(self._starts, i, side="right")) - 1
+        return self.chunks[c][i - self._starts[c]]
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            index, rest = index[0], index[1:]
+        else:
+            rest = ()
+        if isinstance(index, (int, np.integer)):
+            return self._frame(int(index))[rest]
+        frames = np.arange(len(self))[index]
+        out = None
+        for j, i in enumerate(frames):
+            frame = self._frame(int(i))[rest]
+            if out is None:
+                out = np.empty((len(frames),) + frame.shape, dtype=self.dtype)
+            out[j] = frame
+        if out is None:
+            out = np.empty((0,) + self.frame_shape, dtype=self.dtype)[(slice(None),) + rest]
+        return out
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
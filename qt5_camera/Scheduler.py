@@ -0,0 +1,74 @@
+import time
+
+class RecordingSchedule:
+    # Decides for every frame, on the writer thread, whether it is written and when a recording is
+    # complete. All times are compared against the frames' monotonic capture timestamps, so the
+    # output length does not depend on thread scheduling.
+    #   duration     seconds per capture, counted from start_at or from when the schedule was made
+    #   max_frames   written frames per capture
+    #   start_at     wall clock time (time.time()) of the first capture, frames before it are skipped
+    #   repeat       number of captures, started every interval seconds
+    #   keep_every   time-lapse, only every k-th frame is written
+    # Without start_at, frames older than the schedule (e.g. from a pre-trigger buffer) are written
+    # as part of the first capture but do not count towards its duration.
+    def __init__(self, duration=None, max_frames=None, start_at=None, repeat=1, interval=None, keep_every=1):
+        if repeat > 1 and interval is None:
+            raise ValueError("repeated captures need an interval")
+        self.duration = duration
+        self.max_frames = max_frames
+        self.repeat = repeat
+        self.interval = interval
+        self.keep_every = max(1, int(keep_every))
+        self.scheduled = start_at is not None
+        if start_at is None:
+            self._next_start = time.monotonic()
+        else:
+            self._next_start = time.monotonic() + (start_at - time.time())
+        self.first_start = self._next_start
+        self.capture = -1
+        self.capture_start = None
+        self.frames = 0
+        self.elapsed = 0.0
+        self.done = False
+        self._seen = 0
+
+    def deadline(self):
+        # monotonic time by which the last capture is over, None if only max_frames ends it
+        if self.duration is None:
+            return None
+        return self.first_start + (self.repeat - 1) * (self.interval or 0) + self.duration
+
+    def accept(self, timestamp):
+        # returns (write, new_capture, capture_ended) for a frame captured at timestamp
+        # (time.monotonic()). capture_ended is set on the first frame after a capture is complete,
+        # if the same frame also starts the next capture new_capture is set as well
+        if self.done:
+            return False, False, False
+        ended = False
+        if self.capture_start is not None:
+            self.elapsed = max(timestamp - self.capture_start, 0.0)
+            if ((self.duration is not None and self.elapsed >= self.duration) or
+                    (self.max_frames is not None and self.frames >= self.max_frames)):
+                ended = True
+                if self.capture + 1 >= self.repeat:
+                    self.done = True
+                    return False, False, True
+                self._next_start = self.capture_start + self.interval
+                self.capture_start = None
+
+        new_capture = False
+        if self.capture_start is None:
+            if timestamp < self._next_start and (self.scheduled or self.capture >= 0):
+                return False, False, ended
+            self.capture += 1
+            self.capture_start = self._next_start
+            self.frames = 0
+            self._seen = 0
+            self.elapsed = max(timestamp - self.capture_start, 0.0)
+            new_capture = True
+
+        keep = self._seen % self.keep_every == 0
+        self._seen += 1
+        if keep:
+            self.frames += 1
+        return keep, new_capture, ended
@@ -0,0 +1,120 @@
+import cv2
+import numpy as np
+import time
+
+class SyntheticCapture:
+    # Stand-in for cv2.VideoCapture that produces BGR frames without hardware. Open it through
+    # Camera with a device name like "synthetic" or "synthetic:fps=240,entropy=0.5,width=1920,height=1080".
+    # entropy is the fraction of pixels replaced by noise on top of a moving gradient, which controls
+    # how hard the frames are to compress. fps=0 delivers frames as fast as they are grabbed.
+    # Frames are taken from a small set generated up front so producing them costs one copy.
+    # Options given in the spec win over the framerate and shape Camera asks for, set() refuses them
+    # like a driver refusing an unsupported mode.
+    n_unique = 16
+
+    def __init__(self, spec="synthetic"):
+        options = dict(width=1280, height=720, fps=30, entropy=0.1, seed=0)
+        self.fixed = set()
+        if ":" in spec:
+            for item in spec.split(":", 1)[1].split(","):
+                key, value = item.split("=")
+                options[key.strip()] = float(value)
+                self.fixed.add(key.strip())
+        self.width = int(options["width"])
+        self.height = int(options["height"])
+        self.fps = options["fps"]
+        self.entropy = options["entropy"]
+        self.seed = int(options["seed"])
+        self.opened = True
+        self.frame_count = 0
+        self._next_time = None
+        self._frames = None
+
+    def _generate(self):
+        rng = np.random.default_rng(self.seed)
+        h, w = self.height, self.width
+        x = np.arange(w, dtype=np.uint16)[None, :]
+        y = np.arange(h, dtype=np.uint16)[:, None]
+        self._frames = np.empty((self.n_unique, h, w, 3), dtype=np.uint8)
+        for i in range(self.n_unique):
+            gray = ((x + y + 8 * i) % 256).astype(np.uint8)
+            if self.entropy > 0:
+                mask = rng.random((h, w)) < self.entropy
+                gray[mask] = rng.integers(0, 256, int(mask.sum()), dtype=np.uint8)
+            self._frames[i] = gray[:, :, None]
+
+    def isOpened(self):
+        return self.opened
+
+    def grab(self):
+        if not self.opened:
+            return False
+        if self.fps > 0:
+            now = time.monotonic()
+            if self._next_time is None or now - self._next_time > 1.0:
+                self._next_time = now
+            elif self._next_time > now:
+                time.sleep(self._next_time - now)
+            self._next_time += 1.0 / self.fps
+        self.frame_count += 1
+        return True
+
+    def retrieve(self, image=None, flag=0):
+        if self._frames is None:
+            self._generate()
+        frame = self._frames[self.frame_count % self.n_unique]
+        if image is not None and image.shape == frame.shape and image.dtype == frame.dtype:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(image)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return 1000.0 * self.frame_count / self.fps if self.fps > 0 else 0.0
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_count)
+        return 0.0
+
+    def set(self, prop, value):
+        if self._option(prop) in self.fixed:
+            return False
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            self.width = int(value)
+        elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            self.height = int(value)
+        elif prop == cv2.CAP_PROP_FPS:
+            self.fps = float(value)
+            return True
+        else:
+            return False
+        self._frames = None
+        return True
+
+    def _option(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: "width", cv2.CAP_PROP_FRAME_HEIGHT: "height",
+                cv2.CAP_PROP_FPS: "fps"}.get(prop)
+
+    def getBackendName(self):
+        return "SYNTHETIC"
+
+    def release(self):
+        self.opened = False
+        self._frames = None
+
+
+def open_capture(camera_index):
+    # cv2.VideoCapture for real devices and files, SyntheticCapture for "synthetic..." names
+    if isinstance(camera_index, str) and camera_index.startswith("synthetic"):
+        return SyntheticCapture(camera_index)
+    return cv2.VideoCapture(camera_index)
@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+class MotionTrigger:
+    # Decides per frame whether a Writer should be recording. The activity metric is the mean
+    # absolute difference between consecutive frames, computed on a decimated (and optionally
+    # cropped) view so it costs a fraction of a full frame pass. Recording switches on once the
+    # activity stays at or above on_threshold for min_on_frames frames and switches off after it
+    # has been below off_threshold for post_frames frames. pre_frames frames from before the
+    # trigger are written at the start of every event.
+    def __init__(self, on_threshold=2.0, off_threshold=None, decimate=8, roi=None,
+                 pre_frames=30, post_frames=30, min_on_frames=1):
+        self.on_threshold = on_threshold
+        self.off_threshold = on_threshold if off_threshold is None else off_threshold
+        self.decimate = decimate
+        #(x, y, w, h) in full frame pixels
+        self.roi = roi
+        self.pre_frames = pre_frames
+        self.post_frames = post_frames
+        self.min_on_frames = min_on_frames
+        self.active = False
+        self.activity = 0.0
+        self._on_count = 0
+        self._post_left = 0
+        self._previous = None
+        self._diff = None
+
+    def measure(self, frame):
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            frame = frame[y:y + h, x:x + w]
+        small = frame[::self.decimate, ::self.decimate]
+        if self._previous is None or self._previous.shape != small.shape:
+            self._previous = np.ascontiguousarray(small)
+            self._diff = np.empty_like(self._previous)
+            return 0.0
+        cv2.absdiff(small, self._previous, dst=self._diff)
+        np.copyto(self._previous, small)
+        return cv2.mean(self._diff)[0]
+
+    def update(self, frame):
+        self.activity = self.measure(frame)
+        if not self.active:
+            self._on_count = self._on_count + 1 if self.activity >= self.on_threshold else 0
+            if self._on_count >= self.min_on_frames:
+                self.active = True
+                self._post_left = self.post_frames
+        elif self.activity >= self.off_threshold:
+            self._post_left = self.post_frames
+        else:
+            self._post_left -= 1
+            if self._post_left < 0:
+                self.active = False
+                self._on_count = 0
+        return self.active
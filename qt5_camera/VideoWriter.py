@@ -1,60 +1,267 @@
 from PyQt5 import QtCore
 import cv2
+import numpy as np
 import time
 import threading
+import os
+from collections import deque
+from ParallelWriter import ParallelVideoWriter
+from RawVideo import RawVideoWriter, chunk_paths
+from Metrics import StageStats
 
-class Timer(QtCore.QThread):
-    signal_timer_started = QtCore.pyqtSignal()
-    signal_timer_stopped = QtCore.pyqtSignal()
-    signal_time_progressed = QtCore.pyqtSignal(float)
-    def __init__(self, duration):
-        QtCore.QThread.__init__(self)
-        self.duration = duration
-        self.running = True
+class TimestampIndex:
+    # CSV sidecar written next to a recording with one row per written frame:
+    # frame (position in the video), camera_frame (FrameInfo.index), timestamp (monotonic seconds),
+    # pos_msec (backend timestamp), gap (number of camera frames missing before this one) and
+    # skipped (frames before this one left out on purpose, e.g. by a time-lapse schedule)
+    header = "frame,camera_frame,timestamp,pos_msec,gap,skipped\n"
 
-    def run(self):
-        start_time = time.time()
-        i = 0
-        while self.running:
-            time_elapsed = time.time() - start_time
-            if time_elapsed >= self.duration:
-                self.running = False
-            else:
-                if i % 10 == 0:
-                    self.signal_time_progressed.emit(time_elapsed)
-                time.sleep(0.01)
-                i+=1
-        self.signal_timer_stopped.emit()
+    def __init__(self, path, last_index=None):
+        self.path = path
+        self.file = open(path, "w", buffering=1 << 16)
+        self.file.write(self.header)
+        self.frame = 0
+        #camera frame written last, carried over between segments so gaps are still detected
+        self.last_index = last_index
+
+    def write(self, info, skipped=0):
+        if info is None:
+            return
+        gap = 0 if self.last_index is None else max(info.index - self.last_index - 1 - skipped, 0)
+        self.file.write(f"{self.frame},{info.index},{info.timestamp:.6f},{info.pos_msec},{gap},{skipped}\n")
+        self.last_index = info.index
+        self.frame += 1
+
+    def close(self):
+        self.file.close()
+
+
+def read_timestamp_index(path):
+    # structured array with the TimestampIndex columns as fields
+    return np.genfromtxt(path, delimiter=",", names=True, dtype=None, ndmin=1)
+
+
+def segment_path(savepath, i):
+    stem, ext = os.path.splitext(savepath)
+    return f"{stem}.part{i:04d}{ext}"
+
+
+def remove_recording(savepath):
+    # delete a recording with its sidecar files, raw chunks and parallel encoder segments
+    paths = [savepath, savepath + ".frames.csv", savepath + ".ffconcat"] + chunk_paths(savepath)
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
 
 
 class Writer(QtCore.QThread):
     signal_writing_started = QtCore.pyqtSignal()
     signal_writing_stopped = QtCore.pyqtSignal()
+    signal_time_progressed = QtCore.pyqtSignal(float)
+    signal_schedule_finished = QtCore.pyqtSignal()
 
-    def __init__(self, q, savepath, framerate, shape):
+    def __init__(self, buffer, savepath, framerate, shape, write_index=True, encoder="serial", workers=None,
+                 parallel_megabytes=None, trigger=None, segment_seconds=None, segment_megabytes=None, max_segments=None, schedule=None):
         QtCore.QThread.__init__(self)
-        self.q = q
-        ext = savepath.split(".")[-1].lower()
-        if ext == "mp4":
-            fourcc =  cv2.VideoWriter_fourcc(*"mp4v")
-        elif ext == "avi":
-            fourcc = cv2.VideoWriter_fourcc(*"XVID")
+        if (segment_seconds or segment_megabytes) and encoder == "parallel" and not savepath.lower().endswith(".raw"):
+            #the parallel encoder already splits the stream into segments of its own, and starting a
+            #process pool with its shared memory for every part would stall writing at each boundary
+            raise ValueError("rolling segments are not supported with the parallel encoder")
+        self.buffer = buffer
+        self.savepath = savepath
+        self.framerate = framerate
+        self.shape = shape
+        self.write_index = write_index
+        self.encoder = encoder
+        self.workers = workers
+        #shared memory for the parallel encoder, see ParallelVideoWriter
+        self.parallel_megabytes = parallel_megabytes
+        #with a trigger (see Trigger.py) only active stretches are written, each to its own file
+        self.trigger = trigger
+        #with a schedule (see Scheduler.py) the recording ends after an exact number of frames or at a
+        #deadline, checked per frame. done is set then, the writer keeps releasing frames until the
+        #buffer is closed. repeated captures are written to <stem>.captureNNNN.<ext>
+        self.schedule = schedule
+        self.done = threading.Event()
+        self._last_progress = None
+        #frames left out by the schedule since the last written one, see TimestampIndex
+        self._skipped = 0
+        #split the output into <stem>.partNNNN.<ext> files of at most segment_seconds/segment_megabytes.
+        #the next file is opened before the previous one is released on a background thread, and
+        #with max_segments only that many of the newest parts are kept on disk
+        self.segment_seconds = segment_seconds
+        self.segment_megabytes = segment_megabytes
+        self.max_segments = max_segments
+        self._finalizers = []
+        self._finished_segments = []
+        self._segment_lock = threading.Lock()
+        self.out = None
+        self.index = None
+        self.outputs = []
+        #encode time per frame and lag behind capture, see Metrics
+        self.stats = StageStats()
+        if trigger is None:
+            if schedule is None or schedule.repeat == 1:
+                self.open_output(savepath)
         else:
-            print(f"extension {ext} not supported. Writing avi with XVID encoding.")
-            fourcc = cv2.VideoWriter_fourcc(*"XVID")
-        self.out = cv2.VideoWriter(savepath, fourcc, framerate, shape, isColor = False)
+            #frames held back as pre-trigger padding, the buffer needs at least one free slot
+            self._pending = deque()
+            self._pre_frames = min(trigger.pre_frames, buffer.capacity - 1)
         self.running = False
 
+    def open_output(self, savepath):
+        if self.segment_seconds or self.segment_megabytes:
+            self._segment_base = savepath
+            self._segment = 0
+            savepath = segment_path(savepath, 0)
+        self._open(savepath)
+
+    def _open(self, savepath, last_index=None):
+        self._segment_start = None
+        self._segment_frames = 0
+        ext = savepath.split(".")[-1].lower()
+        if ext == "raw":
+            #lossless, see RawVideo
+            self.out = RawVideoWriter(savepath, self.framerate, self.shape, dtype=self.buffer.frames.dtype)
+        else:
+            if ext == "mp4":
+                fourcc =  cv2.VideoWriter_fourcc(*"mp4v")
+            elif ext == "avi":
+                fourcc = cv2.VideoWriter_fourcc(*"XVID")
+            else:
+                print(f"extension {ext} not supported. Writing avi with XVID encoding.")
+                fourcc = cv2.VideoWriter_fourcc(*"XVID")
+            if self.encoder == "parallel":
+                #encode segments in a process pool, see ParallelWriter
+                self.out = ParallelVideoWriter(savepath, fourcc, self.framerate, self.shape, workers=self.workers,
+                                               max_megabytes=self.parallel_megabytes)
+            else:
+                self.out = cv2.VideoWriter(savepath, fourcc, self.framerate, self.shape, isColor = False)
+        self.index = TimestampIndex(savepath + ".frames.csv", last_index) if self.write_index else None
+        self.outputs.append(savepath)
+
+    def segment_full(self, info):
+        if self.segment_seconds and info is not None and self._segment_start is not None:
+            if info.timestamp - self._segment_start >= self.segment_seconds:
+                return True
+        elif self.segment_seconds and self._segment_frames >= self.segment_seconds * self.framerate:
+            return True
+        if self.segment_megabytes and self._segment_frames % 30 == 0 and self._segment_frames:
+            if isinstance(self.out, RawVideoWriter):
+                #chunks are preallocated, count what was actually written
+                size = self.out.frame_count * self.out.frame_bytes
+            else:
+                path = self.outputs[-1]
+                size = os.path.getsize(path) if os.path.exists(path) else 0
+            return size >= self.segment_megabytes * 1e6
+        return False
+
+    def next_segment(self):
+        out, index, path = self.out, self.index, self.outputs[-1]
+        last_index = index.last_index if index is not None else None
+        self._segment += 1
+        self._open(segment_path(self._segment_base, self._segment), last_index)
+        finalizer = threading.Thread(target=self.finalize_segment, args=(out, index, path, self._segment - 1))
+        finalizer.start()
+        self._finalizers.append(finalizer)
+
+    def finalize_segment(self, out, index, path, segment):
+        out.release()
+        if index is not None:
+            index.close()
+        if self.max_segments is None:
+            return
+        with self._segment_lock:
+            #segments can finish out of order, keep them sorted by number
+            self._finished_segments.append((segment, path))
+            self._finished_segments.sort()
+            #the segment being written counts towards the limit
+            while len(self._finished_segments) > max(self.max_segments - 1, 0):
+                remove_recording(self._finished_segments.pop(0)[1])
+
+    def close_output(self):
+        if self.out is not None:
+            self.out.release()
+            self.out = None
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def write(self, frame, info):
+        start = time.perf_counter()
+        if (self.segment_seconds or self.segment_megabytes) and self.segment_full(info):
+            self.next_segment()
+        if self._segment_start is None and info is not None:
+            self._segment_start = info.timestamp
+        self._segment_frames += 1
+        self.out.write(frame)
+        if self.index is not None:
+            self.index.write(info, self._skipped)
+        self._skipped = 0
+        now = time.perf_counter()
+        self.stats.add(now - start, lag=time.monotonic() - info.timestamp if info is not None else None)
+
     def run(self):
         self.running = True
         self.signal_writing_started.emit()
         while self.running:
-            frame = self.q.get()
-            if type(frame)==(str):
-                self.running=False
-                print(frame)
+            item = self.buffer.get()
+            if item is None:
+                # buffer closed and drained
+                self.running = False
+            elif self.schedule is not None and not self.scheduled(item[2]):
+                self._skipped += 1
+                self.buffer.release(item[0])
+            elif self.trigger is None:
+                slot, frame, info = item
+                self.write(frame, info)
+                self.buffer.release(slot)
             else:
-                self.out.write(frame)
-                self.q.task_done()
-        self.out.release()
+                self.write_triggered(*item)
+        if self.trigger is not None:
+            while self._pending:
+                self.buffer.release(self._pending.popleft()[0])
+        self.close_output()
+        for finalizer in self._finalizers:
+            finalizer.join()
+        print(f"done, {self.buffer.dropped} frames dropped")
         self.signal_writing_stopped.emit()
+
+    def scheduled(self, info):
+        timestamp = info.timestamp if info is not None else time.monotonic()
+        write, new_capture, ended = self.schedule.accept(timestamp)
+        if ended and self.schedule.repeat > 1 and self.trigger is None:
+            #finish the file now, not when the next capture starts
+            self.close_output()
+        if new_capture and self.schedule.repeat > 1 and self.trigger is None:
+            self.close_output()
+            self._skipped = 0
+            stem, ext = os.path.splitext(self.savepath)
+            self.open_output(f"{stem}.capture{self.schedule.capture:04d}{ext}")
+        if self.schedule.done:
+            if not self.done.is_set():
+                self.close_output()
+                self.done.set()
+                self.signal_schedule_finished.emit()
+        elif write and (self._last_progress is None or timestamp - self._last_progress >= 0.1):
+            self._last_progress = timestamp
+            self.signal_time_progressed.emit(self.schedule.elapsed)
+        return write
+
+    def write_triggered(self, slot, frame, info):
+        if self.trigger.update(frame):
+            if self.out is None:
+                stem, ext = os.path.splitext(self.savepath)
+                self.open_output(f"{stem}.event{len(self.outputs):04d}{ext}")
+                while self._pending:
+                    pending_slot, pending_frame, pending_info = self._pending.popleft()
+                    self.write(pending_frame, pending_info)
+                    self.buffer.release(pending_slot)
+            self.write(frame, info)
+            self.buffer.release(slot)
+        else:
+            if self.out is not None:
+                self.close_output()
+            self._pending.append((slot, frame, info))
+            while len(self._pending) > self._pre_frames:
+                self.buffer.release(self._pending.popleft()[0])
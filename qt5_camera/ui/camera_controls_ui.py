@@ -133,6 +133,10 @@ class Ui_TileMapWidget(object):
         self.buttonRecord.setCheckable(True)
         self.buttonRecord.setObjectName("buttonRecord")
         self.verticalLayout.addWidget(self.buttonRecord)
+        self.labelMetrics = QtWidgets.QLabel(self.dockWidgetContents)
+        self.labelMetrics.setText("")
+        self.labelMetrics.setObjectName("labelMetrics")
+        self.verticalLayout.addWidget(self.labelMetrics)
         spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
         self.verticalLayout.addItem(spacerItem)
         self.gridLayout.addLayout(self.verticalLayout, 1, 0, 1, 1)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+#modules import each other by name, as in qt5_camera/__main__.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "qt5_camera"))
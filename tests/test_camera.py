@@ -0,0 +1,152 @@
+import time
+import numpy as np
+from Camera import Camera
+
+
+def synthetic_camera(width=64, height=48, **kwargs):
+    # frames are the synthetic source's gradient, identical in all three channels
+    return Camera(f"synthetic:fps=0,width={width},height={height}", 30, 100, 100, **kwargs)
+
+
+def source_frame(cam):
+    cap = cam.cap
+    return cap._frames[cap.frame_count % cap.n_unique][:, :, 0]
+
+
+def next_frame(cam):
+    assert cam.grab()
+    return cam.retrieve()
+
+
+class FlatYuyvCapture:
+    # returns unconverted yuyv as one flat row, like V4L2 with CAP_PROP_CONVERT_RGB off
+    def __init__(self, width, height):
+        self.width, self.height = width, height
+        self.luma = np.arange(width * height, dtype=np.uint8).reshape(height, width)
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        return True
+
+    def retrieve(self, image=None):
+        yuyv = np.empty((self.height, self.width, 2), dtype=np.uint8)
+        yuyv[:, :, 0] = self.luma
+        yuyv[:, :, 1] = 128
+        flat = yuyv.reshape(1, -1)
+        if image is not None and image.shape == flat.shape:
+            np.copyto(image, flat)
+            return True, image
+        return True, flat
+
+    def get(self, prop):
+        import cv2
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.width, cv2.CAP_PROP_FRAME_HEIGHT: self.height}.get(prop, 0.0)
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        pass
+
+
+def test_retrieve_converts_to_gray():
+    cam = synthetic_camera()
+    frame = next_frame(cam)
+    assert frame.shape == (48, 64)
+    assert frame.dtype == np.uint8
+    np.testing.assert_array_equal(frame, source_frame(cam))
+    assert cam.frame_size == (64, 48)
+    cam.stop()
+
+
+def test_frames_rotate_through_the_pool():
+    cam = synthetic_camera(pool_size=3)
+    frames = [next_frame(cam) for _ in range(4)]
+    raw_pool = cam._raw_pool
+    addresses = [f.__array_interface__["data"][0] for f in frames]
+    assert len(set(addresses[:3])) == 3
+    #the fourth frame reuses the first buffer, nothing is allocated after the first frame
+    assert addresses[3] == addresses[0]
+    next_frame(cam)
+    assert cam._raw_pool is raw_pool
+    cam.stop()
+
+
+def test_yuyv_luma_plane():
+    cam = synthetic_camera(capture_mode="yuyv")
+    cam.cap = FlatYuyvCapture(16, 8)
+    frame = next_frame(cam)
+    np.testing.assert_array_equal(frame, cam.cap.luma)
+    cam.stop()
+
+
+def test_run_delivers_frames_with_info():
+    cam = synthetic_camera()
+    received = []
+
+    class Sink:
+        def put(self, frame, info):
+            received.append((frame.shape, info))
+
+    cam.add_sink(Sink())
+    cam.start()
+    time.sleep(0.2)
+    cam.stop()
+    assert len(received) > 2
+    shapes, infos = zip(*received)
+    assert set(shapes) == {(48, 64)}
+    assert [info.index for info in infos] == list(range(len(infos)))
+    timestamps = [info.timestamp for info in infos]
+    assert timestamps == sorted(timestamps)
+
+
+def test_roi_crops_the_frame():
+    cam = synthetic_camera()
+    cam.roi = (8, 4, 32, 20)
+    assert cam.frame_size == (32, 20)
+    frame = next_frame(cam)
+    np.testing.assert_array_equal(frame, source_frame(cam)[4:24, 8:40])
+    assert cam.frame_size == (32, 20)
+    cam.stop()
+
+
+def test_roi_is_clipped_to_the_frame():
+    cam = synthetic_camera()
+    cam.roi = (60, 40, 100, 100)
+    frame = next_frame(cam)
+    assert frame.shape == (8, 4)
+    assert cam.frame_size == (4, 8)
+    cam.stop()
+
+
+def test_binning_averages_blocks():
+    cam = synthetic_camera()
+    cam.binning = 2
+    assert cam.frame_size == (32, 24)
+    frame = next_frame(cam)
+    assert frame.shape == (24, 32)
+    expected = source_frame(cam).reshape(24, 2, 32, 2).astype(np.float32).mean(axis=(1, 3))
+    assert np.abs(frame - expected).max() <= 1
+    cam.stop()
+
+
+def test_roi_is_trimmed_to_the_binning():
+    cam = synthetic_camera()
+    cam.roi = (0, 0, 33, 21)
+    cam.binning = 2
+    assert cam.frame_size == (16, 10)
+    assert next_frame(cam).shape == (10, 16)
+    cam.stop()
+
+
+def test_frame_size_follows_settings_after_capture():
+    cam = synthetic_camera()
+    next_frame(cam)
+    cam.binning = 4
+    assert cam.frame_size == (16, 12)
+    cam.roi = (0, 0, 32, 32)
+    assert cam.frame_size == (8, 8)
+    assert next_frame(cam).shape == (8, 8)
+    cam.stop()
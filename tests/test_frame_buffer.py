@@ -0,0 +1,99 @@
+import threading
+import numpy as np
+import pytest
+from FrameBuffer import FrameRingBuffer, BLOCK, DROP_OLDEST, DROP_NEWEST, frames_for_megabytes, pretrigger_frames
+
+
+def fill(buffer, values, **kwargs):
+    return [buffer.put(np.full(buffer.shape, v, dtype=np.uint8), v, **kwargs) for v in values]
+
+
+def drain(buffer):
+    values = []
+    buffer.close()
+    while True:
+        item = buffer.get()
+        if item is None:
+            return values
+        slot, frame, info = item
+        assert frame[0, 0] == info
+        values.append(info)
+        buffer.release(slot)
+
+
+def test_get_returns_frames_in_order():
+    buffer = FrameRingBuffer(4, (2, 3))
+    fill(buffer, [1, 2, 3])
+    assert len(buffer) == 3
+    assert drain(buffer) == [1, 2, 3]
+    assert buffer.dropped == 0
+
+
+def test_drop_oldest_keeps_newest_frames():
+    buffer = FrameRingBuffer(3, (2, 2), policy=DROP_OLDEST)
+    assert fill(buffer, [1, 2, 3, 4, 5]) == [True] * 5
+    assert buffer.dropped == 2
+    assert drain(buffer) == [3, 4, 5]
+
+
+def test_drop_newest_rejects_incoming_frames():
+    buffer = FrameRingBuffer(3, (2, 2), policy=DROP_NEWEST)
+    assert fill(buffer, [1, 2, 3, 4, 5]) == [True, True, True, False, False]
+    assert buffer.dropped == 2
+    assert drain(buffer) == [1, 2, 3]
+
+
+def test_block_times_out_and_counts_drop():
+    buffer = FrameRingBuffer(2, (2, 2), policy=BLOCK)
+    assert fill(buffer, [1, 2, 3], timeout=0.05) == [True, True, False]
+    assert buffer.dropped == 1
+
+
+def test_block_waits_for_release():
+    buffer = FrameRingBuffer(1, (2, 2), policy=BLOCK)
+    fill(buffer, [1])
+    slot, frame, info = buffer.get()
+    threading.Timer(0.05, buffer.release, args=(slot,)).start()
+    assert fill(buffer, [2], timeout=5) == [True]
+    assert buffer.dropped == 0
+
+
+def test_close_wakes_blocked_producer():
+    buffer = FrameRingBuffer(1, (2, 2), policy=BLOCK)
+    fill(buffer, [1])
+    threading.Timer(0.05, buffer.close).start()
+    assert fill(buffer, [2]) == [False]
+
+
+def test_keep_holds_last_frames_as_pretrigger():
+    buffer = FrameRingBuffer(5, (2, 2), policy=DROP_OLDEST, keep=2)
+    fill(buffer, range(1, 7))
+    assert len(buffer) == 2
+    #recycling down to keep is not a drop
+    assert buffer.dropped == 0
+    buffer.configure(BLOCK)
+    fill(buffer, [7])
+    assert drain(buffer) == [5, 6, 7]
+
+
+def test_configure_resets_dropped():
+    buffer = FrameRingBuffer(1, (2, 2), policy=DROP_NEWEST)
+    fill(buffer, [1, 2])
+    assert buffer.dropped == 1
+    buffer.configure(DROP_OLDEST)
+    assert buffer.dropped == 0
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        FrameRingBuffer(0, (2, 2))
+    with pytest.raises(ValueError):
+        FrameRingBuffer(1, (2, 2), policy="spill")
+
+
+def test_sizes():
+    assert frames_for_megabytes(1, (1000, 1000)) == 1
+    assert frames_for_megabytes(0, (1000, 1000)) == 1
+    assert pretrigger_frames(30, (1000, 1000), seconds=5) == 150
+    assert pretrigger_frames(30, (1000, 1000), seconds=5, megabytes=10) == 10
+    assert pretrigger_frames(30, (1000, 1000)) == 0
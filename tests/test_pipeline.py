@@ -0,0 +1,72 @@
+import random
+import threading
+import time
+import numpy as np
+import pytest
+from Camera import FrameInfo
+from Pipeline import Pipeline, BackgroundSubtraction, FlatField
+
+SHAPE = (6, 8)
+
+
+class Collector:
+    def __init__(self):
+        self.frames = []
+
+    def put(self, frame, info):
+        self.frames.append((int(frame[0, 0]), info.index))
+
+
+def run(pipeline, n):
+    collector = Collector()
+    pipeline.add_sink(collector)
+    pipeline.start()
+    for i in range(n):
+        pipeline.put(np.full(SHAPE, i, dtype=np.uint8), FrameInfo(i, time.monotonic(), 0.0))
+    pipeline.stop()
+    return collector.frames
+
+
+def test_frames_are_delivered_in_capture_order():
+    rng = random.Random(0)
+
+    def slow_stage(frame, info):
+        time.sleep(rng.random() * 0.005)
+        return frame + 1
+
+    frames = run(Pipeline([slow_stage], SHAPE, workers=4), 50)
+    assert frames == [(i + 1, i) for i in range(50)]
+
+
+def test_failed_frames_are_dropped():
+    def stage(frame, info):
+        if info.index % 5 == 0:
+            raise RuntimeError("bad frame")
+
+    pipeline = Pipeline([stage], SHAPE, workers=2)
+    frames = run(pipeline, 20)
+    assert [index for _, index in frames] == [i for i in range(20) if i % 5]
+    assert pipeline.dropped == 4
+
+
+def test_full_pipeline_drops_without_blocking():
+    release = threading.Event()
+
+    def stage(frame, info):
+        release.wait()
+
+    pipeline = Pipeline([stage], SHAPE, workers=1, max_in_flight=2, block=False)
+    pipeline.start()
+    accepted = [pipeline.put(np.zeros(SHAPE, dtype=np.uint8), FrameInfo(i, time.monotonic(), 0.0))
+                for i in range(5)]
+    assert accepted == [True, True, False, False, False]
+    assert pipeline.dropped == 3
+    release.set()
+    pipeline.stop()
+    assert len(pipeline) == 0
+
+
+def test_stage_images_must_match_the_frames():
+    with pytest.raises(ValueError):
+        Pipeline([FlatField(np.ones((4, 4), dtype=np.uint8))], SHAPE)
+    Pipeline([FlatField(np.ones(SHAPE, dtype=np.uint8)), BackgroundSubtraction()], SHAPE)
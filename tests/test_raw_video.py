@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from RawVideo import RawVideoWriter, RawVideoReader, chunk_paths, read_header
+
+
+def record(path, frames, **kwargs):
+    n, h, w = frames.shape
+    writer = RawVideoWriter(path, 120.0, (w, h), **kwargs)
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return writer
+
+
+def test_round_trip_across_chunks(tmp_path):
+    path = str(tmp_path / "video.raw")
+    frames = np.random.default_rng(0).integers(0, 256, (7, 5, 6), dtype=np.uint8)
+    record(path, frames, chunk_frames=3)
+    assert len(chunk_paths(path)) == 3
+
+    reader = RawVideoReader(path)
+    assert reader.shape == frames.shape
+    assert reader.fps == 120.0
+    assert len(reader) == 7
+    np.testing.assert_array_equal(np.stack(list(reader)), frames)
+    np.testing.assert_array_equal(reader[2:6], frames[2:6])
+    np.testing.assert_array_equal(reader[-1], frames[-1])
+    np.testing.assert_array_equal(reader[3, 1:3, 2], frames[3, 1:3, 2])
+    with pytest.raises(IndexError):
+        reader[7]
+
+
+def test_partial_chunk_header_counts_written_frames(tmp_path):
+    path = str(tmp_path / "video.raw")
+    record(path, np.zeros((4, 2, 2), dtype=np.uint8), chunk_frames=10)
+    header = read_header(chunk_paths(path)[0])
+    assert header["frame_count"] == 4
+    assert (header["height"], header["width"]) == (2, 2)
+
+
+def test_uint16_frames(tmp_path):
+    path = str(tmp_path / "deep.raw")
+    frames = np.arange(3 * 4 * 4, dtype=np.uint16).reshape(3, 4, 4) * 1000
+    record(path, frames, dtype=np.uint16)
+    reader = RawVideoReader(path)
+    assert reader.dtype == np.uint16
+    np.testing.assert_array_equal(reader[:], frames)
+
+
+def test_missing_and_foreign_files(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        RawVideoReader(str(tmp_path / "none.raw"))
+    other = tmp_path / "other.raw"
+    other.write_bytes(b"\0" * 8192)
+    with pytest.raises(ValueError):
+        RawVideoReader(str(other))
@@ -0,0 +1,75 @@
+import time
+import pytest
+from Scheduler import RecordingSchedule
+
+
+def run(schedule, timestamps):
+    return [schedule.accept(t) for t in timestamps]
+
+
+def test_max_frames():
+    schedule = RecordingSchedule(max_frames=3)
+    t0 = time.monotonic()
+    results = run(schedule, [t0 + i for i in range(5)])
+    assert [r[0] for r in results] == [True, True, True, False, False]
+    assert results[0][1] and not results[1][1]
+    #the end is reported on the first frame after the capture
+    assert results[3] == (False, False, True)
+    assert schedule.done
+
+
+def test_duration_is_checked_against_frame_timestamps():
+    schedule = RecordingSchedule(duration=1.0)
+    t0 = schedule.first_start
+    writes = [r[0] for r in run(schedule, [t0 + 0.1, t0 + 0.5, t0 + 0.99, t0 + 1.0, t0 + 1.1])]
+    assert writes == [True, True, True, False, False]
+    assert schedule.done
+    assert schedule.deadline() == pytest.approx(t0 + 1.0)
+
+
+def test_frames_from_before_the_schedule_are_written():
+    schedule = RecordingSchedule(duration=1.0)
+    t0 = schedule.first_start
+    assert schedule.accept(t0 - 2.0)[0]
+    assert schedule.elapsed == 0.0
+
+
+def test_start_at_skips_earlier_frames():
+    schedule = RecordingSchedule(max_frames=1, start_at=time.time() + 10)
+    t0 = schedule.first_start
+    assert schedule.accept(t0 - 1.0) == (False, False, False)
+    assert schedule.accept(t0 + 0.1) == (True, True, False)
+
+
+def test_repeat():
+    schedule = RecordingSchedule(duration=1.0, repeat=2, interval=5.0)
+    t0 = schedule.first_start
+    assert schedule.accept(t0 + 0.5) == (True, True, False)
+    assert schedule.accept(t0 + 1.5) == (False, False, True)
+    assert schedule.accept(t0 + 3.0) == (False, False, False)
+    assert schedule.accept(t0 + 5.0) == (True, True, False)
+    assert schedule.capture == 1
+    assert schedule.accept(t0 + 6.0) == (False, False, True)
+    assert schedule.done
+    assert schedule.deadline() == pytest.approx(t0 + 6.0)
+
+
+def test_back_to_back_captures_end_and_start_on_one_frame():
+    schedule = RecordingSchedule(max_frames=2, repeat=2, interval=0.0)
+    t0 = schedule.first_start
+    results = run(schedule, [t0 + i for i in range(5)])
+    assert results == [(True, True, False), (True, False, False), (True, True, True),
+                       (True, False, False), (False, False, True)]
+
+
+def test_keep_every():
+    schedule = RecordingSchedule(max_frames=3, keep_every=4)
+    t0 = schedule.first_start
+    writes = [r[0] for r in run(schedule, [t0 + i for i in range(12)])]
+    assert [i for i, w in enumerate(writes) if w] == [0, 4, 8]
+    assert schedule.done
+
+
+def test_repeat_needs_interval():
+    with pytest.raises(ValueError):
+        RecordingSchedule(duration=1.0, repeat=2)
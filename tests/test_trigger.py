@@ -0,0 +1,45 @@
+import numpy as np
+from Trigger import MotionTrigger
+
+
+def frames(levels, shape=(64, 64)):
+    # consecutive frames whose mean absolute difference is the given level
+    value = 0
+    out = [np.zeros(shape, dtype=np.uint8)]
+    for level in levels:
+        value = value + level if value + level <= 255 else value - level
+        out.append(np.full(shape, value, dtype=np.uint8))
+    return out
+
+
+def run(trigger, levels):
+    return [trigger.update(frame) for frame in frames(levels)][1:]
+
+
+def test_measures_frame_difference():
+    trigger = MotionTrigger(on_threshold=5)
+    states = run(trigger, [3, 7])
+    assert trigger.activity == 7
+    assert states == [False, True]
+
+
+def test_hysteresis_and_post_frames():
+    trigger = MotionTrigger(on_threshold=10, off_threshold=4, post_frames=2)
+    #between the thresholds keeps recording once on, but does not switch on
+    assert run(trigger, [6, 12, 6, 6, 1, 1, 1, 1]) == [False, True, True, True, True, True, False, False]
+
+
+def test_min_on_frames():
+    trigger = MotionTrigger(on_threshold=5, min_on_frames=3, post_frames=0)
+    assert run(trigger, [8, 8, 0, 8, 8, 8]) == [False, False, False, False, False, True]
+
+
+def test_roi_ignores_motion_outside():
+    trigger = MotionTrigger(on_threshold=5, roi=(0, 0, 16, 16), decimate=1)
+    still = np.zeros((64, 64), dtype=np.uint8)
+    moved = still.copy()
+    moved[32:, 32:] = 200
+    assert trigger.update(still) is False
+    assert trigger.update(moved) is False
+    moved[:16, :16] = 200
+    assert trigger.update(moved) is True
@@ -0,0 +1,92 @@
+import os
+import numpy as np
+from Camera import FrameInfo
+from FrameBuffer import FrameRingBuffer
+from RawVideo import RawVideoReader
+from Scheduler import RecordingSchedule
+from VideoWriter import Writer, read_timestamp_index, segment_path
+
+SHAPE = (8, 6)
+
+
+def record(path, indices, period=1 / 8, **kwargs):
+    # writes a frame filled with its camera index for every index, captured period seconds apart,
+    # on the calling thread
+    buffer = FrameRingBuffer(len(indices) + 1, (SHAPE[1], SHAPE[0]))
+    for i, index in enumerate(indices):
+        buffer.put(np.full(buffer.shape, index, dtype=np.uint8), FrameInfo(index, 1000.0 + i * period, 0.0))
+    buffer.close()
+    writer = Writer(buffer, str(path), 8.0, SHAPE, **kwargs)
+    writer.run()
+    return writer
+
+
+def written(path):
+    return [int(frame[0, 0]) for frame in RawVideoReader(path)]
+
+
+def test_segments_split_by_capture_time(tmp_path):
+    path = str(tmp_path / "video.raw")
+    writer = record(path, range(20), segment_seconds=1.0)
+    assert writer.outputs == [segment_path(path, i) for i in range(3)]
+    assert written(writer.outputs[0]) == list(range(8))
+    assert written(writer.outputs[1]) == list(range(8, 16))
+    assert written(writer.outputs[2]) == list(range(16, 20))
+    index = read_timestamp_index(writer.outputs[1] + ".frames.csv")
+    assert list(index["frame"]) == list(range(8))
+    assert list(index["camera_frame"]) == list(range(8, 16))
+    #no gap is reported at a segment boundary
+    assert list(index["gap"]) == [0] * 8
+
+
+def test_max_segments_keeps_the_newest(tmp_path):
+    path = str(tmp_path / "video.raw")
+    writer = record(path, range(40), segment_seconds=1.0, max_segments=2)
+    assert len(writer.outputs) == 5
+    for removed in writer.outputs[:3]:
+        assert not os.path.exists(removed)
+        assert not os.path.exists(removed + ".frames.csv")
+    assert written(writer.outputs[3]) == list(range(24, 32))
+    assert written(writer.outputs[4]) == list(range(32, 40))
+
+
+def test_retention_orders_segments_by_number(tmp_path):
+    path = str(tmp_path / "video.avi")
+    buffer = FrameRingBuffer(2, (SHAPE[1], SHAPE[0]))
+    writer = Writer(buffer, path, 8.0, SHAPE, write_index=False, segment_seconds=1.0, max_segments=3)
+    writer.close_output()
+
+    class Finished:
+        def release(self):
+            pass
+
+    #segments finish out of order, and part10000 sorts before part9999 as a string
+    for segment in (10000, 9999, 10001):
+        part = segment_path(path, segment)
+        open(part, "w").close()
+        writer.finalize_segment(Finished(), None, part, segment)
+    assert not os.path.exists(segment_path(path, 9999))
+    assert os.path.exists(segment_path(path, 10000))
+    assert os.path.exists(segment_path(path, 10001))
+
+
+def test_index_reports_gaps(tmp_path):
+    path = str(tmp_path / "video.raw")
+    record(path, [0, 1, 2, 5, 6, 8])
+    index = read_timestamp_index(path + ".frames.csv")
+    assert list(index["frame"]) == list(range(6))
+    assert list(index["camera_frame"]) == [0, 1, 2, 5, 6, 8]
+    assert list(index["gap"]) == [0, 0, 0, 2, 0, 1]
+    np.testing.assert_allclose(index["timestamp"], 1000.0 + np.arange(6) / 8)
+
+
+def test_index_separates_skipped_frames_from_gaps(tmp_path):
+    path = str(tmp_path / "video.raw")
+    #camera frame 3 is lost, every other delivered frame is left out on purpose
+    writer = record(path, [0, 1, 2, 4, 5, 6, 7, 8, 9], schedule=RecordingSchedule(max_frames=4, keep_every=2))
+    assert writer.done.is_set()
+    assert written(path) == [0, 2, 5, 7]
+    index = read_timestamp_index(path + ".frames.csv")
+    assert list(index["camera_frame"]) == [0, 2, 5, 7]
+    assert list(index["skipped"]) == [0, 1, 1, 1]
+    assert list(index["gap"]) == [0, 0, 1, 0]